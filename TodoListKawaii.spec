@@ -19,11 +19,13 @@ a = Analysis(
     hiddenimports=[
         'PIL._tkinter_finder',
         'tkcalendar',
-        'pytz',
-        'schedule',
+        'tzdata',
         'dateutil',
         'dateutil.tz',
         'pystray',
+        'PIL.Image',
+        'plyer',
+        'plyer.platforms.win.notification',
     ],
     hookspath=[],
     hooksconfig={},
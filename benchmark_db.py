@@ -0,0 +1,241 @@
+"""
+Micro-benchmark de la clase Database (main.py).
+
+Genera bases tareas.db sintéticas de 1k, 10k, 100k y 1M tareas con una mezcla
+realista (importancia, recordatorios, tareas permanentes y completadas), mide cada
+método público y reporta percentiles en ms. Los resultados se pueden guardar como
+línea base y comparar después para detectar regresiones.
+
+Uso:
+    python benchmark_db.py                                  # todos los tamaños
+    python benchmark_db.py --tamanos 1000,10000 --guardar-base base_db.json
+    python benchmark_db.py --comparar base_db.json          # sale con código 1 si hay regresiones
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import timedelta
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, script_dir)
+
+from main import Database, rango_importancia  # noqa: E402
+
+TAMANOS = (1_000, 10_000, 100_000, 1_000_000)
+PALABRAS = (
+    "comprar pagar llamar revisar enviar preparar limpiar estudiar leer escribir "
+    "pan leche cuenta luz agua correo informe reunión médico dentista perro gato "
+    "regalo cumpleaños tarea clase proyecto banco farmacia auto viaje mamá papá"
+).split()
+FRACCION_COMPLETADAS = 0.4
+FRACCION_CON_RECORDATORIO = 0.3
+FRACCION_PERMANENTES = 0.2      # de las que tienen recordatorio
+LOTE_GENERACION = 10_000
+
+
+def texto_al_azar(rnd, minimo, maximo):
+    return " ".join(rnd.choice(PALABRAS) for _ in range(rnd.randint(minimo, maximo)))
+
+
+def tarea_al_azar(rnd, ahora):
+    """Dict para Database.agregar_tareas con la mezcla de la app real."""
+    importancia = rnd.choices(("Normal", "Importante", "Urgente"), weights=(70, 20, 10))[0]
+    tarea = {
+        "titulo": texto_al_azar(rnd, 2, 5).capitalize(),
+        "descripcion": texto_al_azar(rnd, 0, 15),
+        "importancia": importancia,
+    }
+    if rnd.random() < FRACCION_CON_RECORDATORIO:
+        fecha = ahora + timedelta(days=rnd.randint(-30, 30), minutes=rnd.randint(0, 1439))
+        tarea["fecha_recordatorio"] = fecha.strftime("%Y-%m-%d %H:%M:00")
+        tarea["es_permanente"] = rnd.random() < FRACCION_PERMANENTES
+    return tarea
+
+
+def generar_base(ruta, cantidad, semilla):
+    """Crea (o reutiliza si ya tiene 'cantidad' filas) una base sintética."""
+    if os.path.isfile(ruta):
+        try:
+            with sqlite3.connect(ruta) as conn:
+                if conn.execute("SELECT COUNT(*) FROM tareas").fetchone()[0] == cantidad:
+                    return
+        except sqlite3.Error:
+            pass
+        os.remove(ruta)
+    rnd = random.Random(semilla)
+    db = Database(ruta)
+    ahora = db._ahora()
+    inicio = time.perf_counter()
+    for desde in range(0, cantidad, LOTE_GENERACION):
+        n = min(LOTE_GENERACION, cantidad - desde)
+        ids = db.agregar_tareas([tarea_al_azar(rnd, ahora) for _ in range(n)])
+        db.marcar_completadas([i for i in ids if rnd.random() < FRACCION_COMPLETADAS])
+    db.cerrar()
+    print(f"  generada base de {cantidad} tareas en {time.perf_counter() - inicio:.1f} s", file=sys.stderr)
+
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    if len(ordenados) == 1:
+        return ordenados[0]
+    posicion = (len(ordenados) - 1) * p / 100
+    abajo = int(posicion)
+    arriba = min(abajo + 1, len(ordenados) - 1)
+    return ordenados[abajo] + (ordenados[arriba] - ordenados[abajo]) * (posicion - abajo)
+
+
+def medir(funcion, repeticiones):
+    """Llama funcion(i) 'repeticiones' veces; devuelve percentiles en ms."""
+    tiempos = []
+    for i in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion(i)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return {
+        "n": repeticiones,
+        "p50": round(percentil(tiempos, 50), 4),
+        "p90": round(percentil(tiempos, 90), 4),
+        "p99": round(percentil(tiempos, 99), 4),
+        "max": round(max(tiempos), 4),
+    }
+
+
+def clave_pagina(tarea):
+    """Clave de orden (keyset) de una tarea de obtener_pagina_tareas."""
+    return (rango_importancia(tarea.importancia), tarea.fecha_recordatorio or "", tarea.fecha_creacion, tarea.id)
+
+
+def medir_base(ruta, repeticiones, repeticiones_pesadas, semilla):
+    """Mide todos los métodos públicos de Database sobre una copia de trabajo de la base."""
+    rnd = random.Random(semilla)
+    db = Database(ruta)
+    ahora = db._ahora()
+    conn = db._conexion()
+    pendientes = [fila[0] for fila in conn.execute("SELECT id FROM tareas WHERE completada = 0 LIMIT 100000")]
+    ids = lambda: rnd.choice(pendientes)  # noqa: E731
+    primera_pagina = db.obtener_pagina_tareas(limite=100)
+    clave_media = clave_pagina(db.obtener_pagina_tareas(desplazamiento=len(pendientes) // 2, limite=1)[0])
+    nuevos = []
+    resultados = {}
+    
+    casos = [
+        # (nombre, función(i), pesado)
+        ("init_db(base existente)", lambda i: db.init_db(), False),
+        ("obtener_pendientes", lambda i: db.obtener_pendientes(), True),
+        ("obtener_pendientes(100 ids)", lambda i: db.obtener_pendientes(rnd.sample(pendientes, 100)), False),
+        ("obtener_tareas", lambda i: db.obtener_tareas(False), True),
+        ("obtener_tareas(completadas)", lambda i: db.obtener_tareas(True), True),
+        ("obtener_tareas_pendientes_recordatorio", lambda i: db.obtener_tareas_pendientes_recordatorio(), True),
+        ("obtener_pagina_tareas(inicio)", lambda i: db.obtener_pagina_tareas(limite=100), False),
+        ("obtener_pagina_tareas(despues_de)", lambda i: db.obtener_pagina_tareas(despues_de=clave_media, limite=100), False),
+        ("obtener_pagina_tareas(antes_de)", lambda i: db.obtener_pagina_tareas(antes_de=clave_pagina(primera_pagina[-1]), limite=100), False),
+        ("obtener_pagina_tareas(desplazamiento)", lambda i: db.obtener_pagina_tareas(desplazamiento=rnd.randrange(len(pendientes)), limite=100), True),
+        ("buscar_tareas", lambda i: db.buscar_tareas(rnd.choice(PALABRAS)[:4]), True),
+        ("obtener_tarea_por_id", lambda i: db.obtener_tarea_por_id(ids()), False),
+        ("agregar_tarea", lambda i: nuevos.append(db.agregar_tarea(**tarea_al_azar(rnd, ahora))), False),
+        ("agregar_tareas(100)", lambda i: nuevos.extend(db.agregar_tareas([tarea_al_azar(rnd, ahora) for _ in range(100)])), False),
+        ("actualizar_tarea", lambda i: db.actualizar_tarea(ids(), titulo=texto_al_azar(rnd, 2, 5)), False),
+        ("actualizar_tarea(recordatorio)", lambda i: db.actualizar_tarea(
+            ids(), fecha_recordatorio=(ahora + timedelta(minutes=rnd.randint(1, 10000))).strftime("%Y-%m-%d %H:%M:00")
+        ), False),
+        ("actualizar_importancia(100)", lambda i: db.actualizar_importancia(rnd.sample(pendientes, 100), "Importante"), False),
+        ("posponer_recordatorio", lambda i: db.posponer_recordatorio(ids()), False),
+        ("registrar_notificacion(10)", lambda i: db.registrar_notificacion(rnd.sample(pendientes, 10)), False),
+        ("marcar_completada", lambda i: db.marcar_completada(nuevos.pop()), False),
+        ("marcar_completadas(100)", lambda i: db.marcar_completadas([nuevos.pop() for _ in range(100)]), False),
+        ("eliminar_tarea", lambda i: db.eliminar_tarea(nuevos.pop()), False),
+        ("eliminar_tareas(100)", lambda i: db.eliminar_tareas([nuevos.pop() for _ in range(100)]), False),
+    ]
+    for nombre, funcion, pesado in casos:
+        if nombre.startswith(("marcar_completada", "eliminar_tarea")):
+            # Se completan/eliminan tareas creadas en este mismo benchmark
+            faltan = repeticiones * 100 - len(nuevos)
+            if faltan > 0:
+                nuevos.extend(db.agregar_tareas([tarea_al_azar(rnd, ahora) for _ in range(faltan)]))
+        resultados[nombre] = medir(funcion, repeticiones_pesadas if pesado else repeticiones)
+    db.cerrar()
+    return resultados
+
+
+def comparar(actual, base, umbral):
+    """Lista de regresiones: p50 actual / p50 base por encima del umbral."""
+    regresiones = []
+    for tamano, metodos in actual["resultados"].items():
+        for metodo, medida in metodos.items():
+            anterior = base.get("resultados", {}).get(tamano, {}).get(metodo)
+            if not anterior or anterior["p50"] <= 0:
+                continue
+            razon = medida["p50"] / anterior["p50"]
+            medida["vs_base"] = round(razon, 2)
+            if razon > umbral:
+                regresiones.append(f"{tamano} {metodo}: p50 {anterior['p50']} -> {medida['p50']} ms (x{razon:.2f})")
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmark de Database")
+    parser.add_argument("--tamanos", default=",".join(str(t) for t in TAMANOS),
+                        help="Cantidades de tareas separadas por coma (por defecto 1000,10000,100000,1000000)")
+    parser.add_argument("--repeticiones", type=int, default=200, help="Repeticiones de los métodos rápidos")
+    parser.add_argument("--repeticiones-pesadas", type=int, default=10,
+                        help="Repeticiones de los métodos que recorren muchas filas")
+    parser.add_argument("--carpeta", default=os.path.join(tempfile.gettempdir(), "agenda_benchmark_db"),
+                        help="Dónde guardar (y reutilizar) las bases generadas")
+    parser.add_argument("--semilla", type=int, default=1234)
+    parser.add_argument("--salida", help="Archivo JSON con los resultados")
+    parser.add_argument("--guardar-base", metavar="ARCHIVO", help="Guardar los resultados como línea base")
+    parser.add_argument("--comparar", metavar="ARCHIVO", help="Comparar contra una línea base guardada")
+    parser.add_argument("--umbral", type=float, default=1.25,
+                        help="Razón p50 actual/base desde la que se considera regresión (por defecto 1.25)")
+    args = parser.parse_args()
+    
+    os.makedirs(args.carpeta, exist_ok=True)
+    informe = {
+        "fecha": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "plataforma": platform.platform(),
+        "resultados": {},
+    }
+    for tamano in (int(t) for t in args.tamanos.split(",")):
+        print(f"Base de {tamano} tareas...", file=sys.stderr)
+        original = os.path.join(args.carpeta, f"tareas_{tamano}.db")
+        generar_base(original, tamano, args.semilla)
+        # Los métodos que escriben trabajan sobre una copia, para que cada corrida parta igual
+        trabajo = os.path.join(args.carpeta, f"trabajo_{tamano}.db")
+        shutil.copyfile(original, trabajo)
+        try:
+            informe["resultados"][str(tamano)] = medir_base(
+                trabajo, args.repeticiones, args.repeticiones_pesadas, args.semilla
+            )
+        finally:
+            for sufijo in ("", "-wal", "-shm"):
+                if os.path.exists(trabajo + sufijo):
+                    os.remove(trabajo + sufijo)
+    
+    regresiones = []
+    if args.comparar:
+        with open(args.comparar, "r", encoding="utf-8") as f:
+            regresiones = comparar(informe, json.load(f), args.umbral)
+        informe["regresiones"] = regresiones
+    
+    texto = json.dumps(informe, ensure_ascii=False, indent=2)
+    for archivo in (args.salida, args.guardar_base):
+        if archivo:
+            with open(archivo, "w", encoding="utf-8") as f:
+                f.write(texto)
+    print(texto)
+    if regresiones:
+        print("Regresiones:\n  " + "\n  ".join(regresiones), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+Mide cuánto tarda la Agenda Virtual en arrancar, desde el código fuente o desde el .exe
+generado con TodoListKawaii.spec, y emite los resultados en JSON.
+
+Cada corrida lanza la app en un proceso nuevo con AGENDA_TIEMPOS_INICIO=1 y
+AGENDA_SALIR_TRAS_INICIO=1: la app imprime sus tiempos por etapa y se cierra sola.
+Etapas (ms desde que arranca el proceso): imports (fin de la carga de main.py),
+tk (tk.Tk()), base_datos (Database.init_db),
+interfaz (crear_interfaz), primer_cuadro, almacen (AlmacenTareas.cargar),
+lista (actualizar_lista_tareas), calendario, recordatorios, bandeja y listo (primer
+momento ocioso con todo cargado).
+
+Sin pantalla (Linux) se levanta un Xvfb temporal si está instalado.
+
+Uso:
+    python benchmark_inicio.py                      # 5 corridas desde main.py
+    python benchmark_inicio.py -n 20 --salida inicio.json
+    python benchmark_inicio.py --exe dist/TodoListKawaii.exe
+    python benchmark_inicio.py --imports 15         # además, los 15 imports más lentos
+"""
+import argparse
+import json
+import os
+import platform
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+PATRON_TIEMPOS = re.compile(r"Tiempos de inicio \(ms\): (\{.*\})")
+
+
+def percentil(valores, p):
+    """Percentil p (0-100) por interpolación lineal."""
+    ordenados = sorted(valores)
+    if len(ordenados) == 1:
+        return ordenados[0]
+    posicion = (len(ordenados) - 1) * p / 100
+    abajo = int(posicion)
+    arriba = min(abajo + 1, len(ordenados) - 1)
+    return ordenados[abajo] + (ordenados[arriba] - ordenados[abajo]) * (posicion - abajo)
+
+
+def resumir(valores):
+    return {
+        "min": round(min(valores), 1),
+        "mediana": round(statistics.median(valores), 1),
+        "p90": round(percentil(valores, 90), 1),
+        "max": round(max(valores), 1),
+    }
+
+
+def iniciar_xvfb():
+    """Si no hay pantalla y existe Xvfb, lo inicia en un display libre. Devuelve (proceso, display)."""
+    if sys.platform.startswith("win") or sys.platform == "darwin" or os.environ.get("DISPLAY"):
+        return None, None
+    if not shutil.which("Xvfb"):
+        print("Aviso: no hay DISPLAY ni Xvfb; la app no podrá abrir la ventana.", file=sys.stderr)
+        return None, None
+    for numero in range(99, 120):
+        if os.path.exists(f"/tmp/.X{numero}-lock"):
+            continue
+        proceso = subprocess.Popen(
+            ["Xvfb", f":{numero}", "-screen", "0", "1280x1024x24", "-nolisten", "tcp"],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        time.sleep(0.5)
+        if proceso.poll() is None:
+            return proceso, f":{numero}"
+    return None, None
+
+
+def correr_una_vez(comando, entorno, espera):
+    """Lanza la app una vez. Devuelve (tiempos por etapa, ms totales hasta que el proceso termina)."""
+    inicio = time.perf_counter()
+    resultado = subprocess.run(comando, env=entorno, capture_output=True, text=True, timeout=espera)
+    total = (time.perf_counter() - inicio) * 1000
+    coincidencia = PATRON_TIEMPOS.search(resultado.stdout)
+    if not coincidencia:
+        raise RuntimeError(
+            f"La app no informó sus tiempos (código {resultado.returncode}):\n{resultado.stderr[-2000:]}"
+        )
+    return json.loads(coincidencia.group(1)), total
+
+
+def imports_mas_lentos(python, cantidad):
+    """Usa 'python -X importtime' para listar los imports más lentos de main.py (ms acumulados)."""
+    resultado = subprocess.run(
+        [python, "-X", "importtime", "-c", "import main"],
+        cwd=script_dir, capture_output=True, text=True
+    )
+    tiempos = []
+    for linea in resultado.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        partes = linea.split("|")
+        if len(partes) != 3 or not linea.startswith("import time:"):
+            continue
+        try:
+            acumulado = int(partes[1].strip())
+        except ValueError:
+            continue
+        tiempos.append((partes[2].strip(), acumulado / 1000))
+    tiempos.sort(key=lambda x: x[1], reverse=True)
+    return [{"modulo": nombre, "ms": round(ms, 2)} for nombre, ms in tiempos[:cantidad]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de arranque de la Agenda Virtual")
+    parser.add_argument("-n", "--corridas", type=int, default=5, help="Cantidad de arranques (por defecto 5)")
+    parser.add_argument("--exe", help="Medir el ejecutable de PyInstaller en vez de main.py")
+    parser.add_argument("--db", help="Base de datos a usar (por defecto una vacía y temporal)")
+    parser.add_argument("--imports", type=int, default=0, metavar="N",
+                        help="Agregar los N imports más lentos (python -X importtime)")
+    parser.add_argument("--espera", type=float, default=60, help="Segundos máximos por corrida")
+    parser.add_argument("--salida", help="Archivo JSON de salida (por defecto, la consola)")
+    args = parser.parse_args()
+    
+    comando = [os.path.abspath(args.exe)] if args.exe else [sys.executable, os.path.join(script_dir, "main.py")]
+    xvfb, display = iniciar_xvfb()
+    carpeta_temporal = tempfile.mkdtemp(prefix="agenda_benchmark_")
+    entorno = dict(os.environ)
+    entorno.update({
+        "AGENDA_TIEMPOS_INICIO": "1",
+        "AGENDA_SALIR_TRAS_INICIO": "1",
+        "AGENDA_RUTA_DB": os.path.abspath(args.db) if args.db else os.path.join(carpeta_temporal, "tareas.db"),
+    })
+    if display:
+        entorno["DISPLAY"] = display
+    
+    etapas = {}
+    totales = []
+    try:
+        for corrida in range(args.corridas):
+            tiempos, total = correr_una_vez(comando, entorno, args.espera)
+            for etapa, ms in tiempos.items():
+                etapas.setdefault(etapa, []).append(ms)
+            totales.append(total)
+            print(f"Corrida {corrida + 1}/{args.corridas}: listo en {tiempos.get('listo', 0):.0f} ms", file=sys.stderr)
+    finally:
+        if xvfb:
+            xvfb.terminate()
+        shutil.rmtree(carpeta_temporal, ignore_errors=True)
+    
+    informe = {
+        "fecha": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "objetivo": args.exe or "main.py",
+        "corridas": args.corridas,
+        # Ms desde el inicio del proceso hasta el fin de cada etapa
+        "etapas_ms": {etapa: resumir(valores) for etapa, valores in etapas.items()},
+        # Ms de reloj desde lanzar el proceso hasta que termina (incluye arrancar Python y cerrar)
+        "proceso_ms": resumir(totales),
+    }
+    if args.imports and not args.exe:
+        informe["imports_mas_lentos"] = imports_mas_lentos(sys.executable, args.imports)
+    
+    texto = json.dumps(informe, ensure_ascii=False, indent=2)
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            f.write(texto)
+    print(texto)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""
+Benchmark de la interfaz: abre TodoApp (sin pantalla, con Xvfb) sobre bases sintéticas
+y mide cuánto se congela el bucle de eventos en las operaciones que más se notan:
+refrescar la lista, cambiar de tema, redimensionar, cambiar el tamaño de ventana y
+abrir el diálogo de edición. Además reporta las métricas de ColaInterfaz (profundidad
+y latencia de despacho) tras recibir una ráfaga de trabajos desde otro hilo.
+
+Por cada operación reporta dos tiempos (ms, con mínimo, mediana, p90 y máximo):
+- bloqueo: desde que empieza la operación hasta que el bucle de Tk atiende un evento
+  encolado al inicio (lo que el usuario percibe como congelamiento);
+- hasta_ocioso: hasta que Tk termina de procesar eventos y redibujos (root.update()).
+
+Uso:
+    python benchmark_ui.py                               # bases de 100, 1000 y 10000 tareas
+    python benchmark_ui.py --tamanos 1000,100000 -n 20 --salida ui.json
+    python benchmark_ui.py --comparar ui_base.json       # sale con código 1 si hay regresiones
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, script_dir)
+
+import main as agenda  # noqa: E402
+from benchmark_inicio import iniciar_xvfb, resumir  # noqa: E402
+from benchmark_db import generar_base  # noqa: E402
+
+TAMANOS = (100, 1_000, 10_000)
+ENVIOS_COLA = 500
+
+
+def medir(root, accion, repeticiones):
+    """Ejecuta accion(i) 'repeticiones' veces y mide bloqueo y tiempo hasta quedar ocioso."""
+    bloqueos, ociosos = [], []
+    for i in range(repeticiones):
+        root.update()
+        atendido = []
+        inicio = time.perf_counter()
+        root.after(0, lambda: atendido.append(time.perf_counter()))
+        accion(i)
+        root.update()
+        fin = time.perf_counter()
+        bloqueos.append(((atendido[0] if atendido else fin) - inicio) * 1000)
+        ociosos.append((fin - inicio) * 1000)
+    return {"bloqueo_ms": resumir(bloqueos), "hasta_ocioso_ms": resumir(ociosos)}
+
+
+def esperar_inicio(root, app, espera=60):
+    """Procesa eventos hasta que la app termina su arranque diferido."""
+    limite = time.time() + espera
+    while "listo" not in app.tiempos_inicio:
+        if time.time() > limite:
+            raise RuntimeError("La app no terminó de iniciar")
+        root.update()
+        time.sleep(0.005)
+
+
+def cerrar_dialogos(app):
+    """Oculta la ventana de edición abierta por editar_tarea (se reutiliza en la siguiente)."""
+    if app.dialogo_editar is not None:
+        app.dialogo_editar.cerrar()
+
+
+def escenarios(app, root):
+    """(nombre, accion(i)) a medir. Las acciones son las que dispara el usuario desde la UI."""
+    temas = list(agenda.TEMAS.keys())
+    geometrias = ("900x750", "700x600", "1200x900")
+    modos = ("mediano", "pequeño")
+    
+    def refrescar(i):
+        app.actualizar_lista_tareas()
+    
+    def refrescar_desde_cero(i):
+        # Lista vacía: obliga a insertar todas las filas (como al arrancar)
+        if not app._modo_virtual:
+            app.tree.delete(*app.tree.get_children())
+            app._filas_tree.clear()
+            app._orden_tree.clear()
+        app.actualizar_lista_tareas()
+    
+    def cambiar_tema(i):
+        app.var_tema.set(temas[(i + 1) % len(temas)])
+        app._cambiar_tema()
+    
+    def redimensionar(i):
+        root.geometry(geometrias[i % len(geometrias)])
+    
+    def cambiar_tamaño(i):
+        modo = modos[i % len(modos)]
+        app.tamaño_ventana_actual = modo
+        app._aplicar_tamaño_ventana(modo)
+    
+    def editar(i):
+        cerrar_dialogos(app)
+        filas = app.tree.get_children()
+        if filas:
+            app.tree.selection_set(filas[i % len(filas)])
+            app.editar_tarea()
+    
+    return [
+        ("actualizar_lista_tareas", refrescar),
+        ("actualizar_lista_tareas(desde_cero)", refrescar_desde_cero),
+        ("_cambiar_tema", cambiar_tema),
+        ("redimensionar", redimensionar),
+        ("_aplicar_tamaño_ventana", cambiar_tamaño),
+        ("editar_tarea", editar),
+    ]
+
+
+def medir_cola_ui(root, app, envios=ENVIOS_COLA):
+    """Envía 'envios' refrescos de fila desde otro hilo (como hace el planificador de
+    recordatorios), deja que Tk los despache y devuelve las métricas de la cola."""
+    ids = [tarea.id for tarea in app.almacen.pagina(0, 50)]
+    
+    def enviar():
+        for i in range(envios):
+            app.cola_ui.enviar(app._refrescar_filas, [ids[i % len(ids)]] if ids else [])
+    
+    hilo = threading.Thread(target=enviar, daemon=True)
+    hilo.start()
+    while hilo.is_alive() or app.cola_ui.metricas()["profundidad"]:
+        root.update()
+        time.sleep(0.001)
+    return app.cola_ui.metricas()
+
+
+def medir_base(ruta_db, repeticiones):
+    root = agenda.tk.Tk()
+    app = agenda.TodoApp(root, db_path=ruta_db)
+    resultados = {}
+    try:
+        esperar_inicio(root, app)
+        resultados["inicio_ms"] = dict(app.tiempos_inicio)
+        for nombre, accion in escenarios(app, root):
+            resultados[nombre] = medir(root, accion, repeticiones)
+        cerrar_dialogos(app)
+        resultados["cola_ui"] = medir_cola_ui(root, app)
+    finally:
+        app.cerrar_aplicacion()
+    return resultados
+
+
+def comparar(actual, base, umbral):
+    """Regresiones: mediana de hasta_ocioso actual / base por encima del umbral."""
+    regresiones = []
+    for tamano, escenarios_actuales in actual["resultados"].items():
+        for nombre, medida in escenarios_actuales.items():
+            anterior = base.get("resultados", {}).get(tamano, {}).get(nombre)
+            if nombre in ("inicio_ms", "cola_ui") or not anterior:
+                continue
+            antes = anterior["hasta_ocioso_ms"]["mediana"]
+            ahora = medida["hasta_ocioso_ms"]["mediana"]
+            if antes > 0:
+                medida["vs_base"] = round(ahora / antes, 2)
+                if ahora / antes > umbral:
+                    regresiones.append(f"{tamano} {nombre}: {antes} -> {ahora} ms (x{ahora / antes:.2f})")
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de la interfaz de la Agenda Virtual")
+    parser.add_argument("--tamanos", default=",".join(str(t) for t in TAMANOS),
+                        help="Tareas de cada base, separadas por coma (por defecto 100,1000,10000)")
+    parser.add_argument("-n", "--repeticiones", type=int, default=10)
+    parser.add_argument("--carpeta", default=os.path.join(tempfile.gettempdir(), "agenda_benchmark_db"),
+                        help="Dónde guardar (y reutilizar) las bases generadas")
+    parser.add_argument("--semilla", type=int, default=1234)
+    parser.add_argument("--salida", help="Archivo JSON con los resultados")
+    parser.add_argument("--comparar", metavar="ARCHIVO", help="Comparar contra un informe anterior")
+    parser.add_argument("--umbral", type=float, default=1.25)
+    args = parser.parse_args()
+    
+    xvfb, display = iniciar_xvfb()
+    if display:
+        os.environ["DISPLAY"] = display
+    carpeta_temporal = tempfile.mkdtemp(prefix="agenda_benchmark_ui_")
+    # Configuración aparte: sin notificaciones en pantalla ni efectos, y sin tocar config_tema.json
+    ruta_config = os.path.join(carpeta_temporal, "config_tema.json")
+    with open(ruta_config, "w", encoding="utf-8") as f:
+        json.dump({"notificaciones": "prueba", "calidad_efectos": "ninguna"}, f)
+    os.environ["AGENDA_RUTA_CONFIG"] = ruta_config  # obtener_config() lo lee en el primer uso
+    
+    informe = {
+        "fecha": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "tk": agenda.tk.TkVersion,
+        "plataforma": platform.platform(),
+        "repeticiones": args.repeticiones,
+        "resultados": {},
+    }
+    os.makedirs(args.carpeta, exist_ok=True)
+    try:
+        for tamano in (int(t) for t in args.tamanos.split(",")):
+            print(f"Interfaz con {tamano} tareas...", file=sys.stderr)
+            original = os.path.join(args.carpeta, f"tareas_{tamano}.db")
+            generar_base(original, tamano, args.semilla)
+            trabajo = os.path.join(carpeta_temporal, f"trabajo_{tamano}.db")
+            shutil.copyfile(original, trabajo)
+            informe["resultados"][str(tamano)] = medir_base(trabajo, args.repeticiones)
+    finally:
+        if xvfb:
+            xvfb.terminate()
+        shutil.rmtree(carpeta_temporal, ignore_errors=True)
+    
+    regresiones = []
+    if args.comparar:
+        with open(args.comparar, "r", encoding="utf-8") as f:
+            regresiones = comparar(informe, json.load(f), args.umbral)
+        informe["regresiones"] = regresiones
+    
+    texto = json.dumps(informe, ensure_ascii=False, indent=2)
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            f.write(texto)
+    print(texto)
+    if regresiones:
+        print("Regresiones:\n  " + "\n  ".join(regresiones), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
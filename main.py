@@ -3,32 +3,84 @@ Aplicación TODO List con recordatorios
 Permite crear tareas y recibir notificaciones del sistema con efectos visuales
 """
 
+import time
+# Referencia para el informe de tiempos de inicio: se toma antes de cualquier otro import
+TIEMPO_INICIO_PROCESO = time.perf_counter()
+
 import tkinter as tk
 from tkinter import ttk, messagebox
 import sqlite3
 from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 import threading
-import schedule
-import time
+import queue
+import heapq
+import bisect
 import json
+import importlib
+import atexit
 import os
 import sys
-from tkcalendar import DateEntry
-import pytz
+import re
 import random
 
-try:
-    from PIL import Image, ImageTk
-    HAS_PIL = True
-except ImportError:
-    HAS_PIL = False
+# Etapas del arranque anteriores a TodoApp (ms desde el inicio del proceso): "imports" al
+# terminar de cargar este módulo y "tk" al crear la ventana raíz en main()
+TIEMPOS_INICIO = {}
+
+
+def ms_desde_inicio():
+    """Milisegundos desde TIEMPO_INICIO_PROCESO."""
+    return round((time.perf_counter() - TIEMPO_INICIO_PROCESO) * 1000, 1)
+
+
+# tkcalendar, PIL, pystray y plyer se importan la primera vez que se usan:
+# así la ventana aparece antes (sobre todo en el .exe de PyInstaller)
+_modulos_diferidos = {}
 
-try:
-    import pystray
-    from pystray import MenuItem as item
-    HAS_PYSTRAY = True
-except ImportError:
-    HAS_PYSTRAY = False
+
+def importar_diferido(nombre):
+    """Importa el módulo 'nombre' al primer uso y lo recuerda. Devuelve None si no está instalado."""
+    if nombre not in _modulos_diferidos:
+        try:
+            _modulos_diferidos[nombre] = importlib.import_module(nombre)
+        except ImportError:
+            _modulos_diferidos[nombre] = None
+    return _modulos_diferidos[nombre]
+
+
+# Zona horaria de la instalación ("zona_horaria" en config_tema.json)
+ZONA_HORARIA_PREDETERMINADA = "America/Santiago"
+_zonas_horarias = {}
+
+
+def zona_horaria():
+    """Zona horaria (zoneinfo) configurada; cada zona se crea una sola vez.
+    Si el nombre no existe se usa la del sistema."""
+    nombre = obtener_config().get("zona_horaria", ZONA_HORARIA_PREDETERMINADA)
+    zona = _zonas_horarias.get(nombre)
+    if zona is None:
+        try:
+            zona = ZoneInfo(nombre)
+        except (ZoneInfoNotFoundError, ValueError, TypeError) as e:
+            print(f"Error al cargar la zona horaria {nombre}: {e}")
+            zona = datetime.now().astimezone().tzinfo
+        _zonas_horarias[nombre] = zona
+    return zona
+
+
+def ahora_local():
+    """Hora actual en la zona configurada, sin zona (como se guardan las fechas de texto)."""
+    return datetime.now(zona_horaria()).replace(tzinfo=None)
+
+
+def a_epoch(momento):
+    """Segundos UTC (entero) de una fecha/hora local sin zona; None si momento es None.
+    zoneinfo resuelve los cambios de horario: una hora repetida toma la primera vez
+    y una hora que no existe se corre hacia adelante."""
+    if momento is None:
+        return None
+    return int(momento.replace(tzinfo=zona_horaria()).timestamp())
 
 
 def get_ruta_base():
@@ -123,26 +175,115 @@ TAMANOS_GEOMETRIA = {
     "pequeño": (400, 820),
 }
 
+# Calidad de los efectos de las notificaciones (etiqueta visible: valor para guardar)
+CALIDADES_EFECTOS = {
+    "Automáticos": "automatica",
+    "Completos": "completa",
+    "Reducidos": "reducida",
+    "Sin efectos": "ninguna",
+}
+# Partículas y cuadros por segundo de cada nivel; "automatica" se mueve entre ellos
+NIVELES_EFECTOS = {
+    "completa": {"particulas_iniciales": 15, "max_particulas": 20, "fps": 30},
+    "reducida": {"particulas_iniciales": 5, "max_particulas": 8, "fps": 15},
+    "ninguna": {"particulas_iniciales": 0, "max_particulas": 0, "fps": 15},
+}
+# Niveles por los que se mueve "automatica", de mejor a peor. "ninguna" queda fuera (solo manual):
+# sin partículas no quedaría ningún efecto midiendo cuadros y nunca se podría volver a subir
+ORDEN_NIVELES_EFECTOS = ("completa", "reducida")
+
+# Con más tareas pendientes que esto, el Treeview solo contiene las filas visibles (modo virtual)
+UMBRAL_LISTA_VIRTUAL = 1000
+
+
+class ConfigTema:
+    """config_tema.json en memoria: se lee una sola vez, los cambios se hacen sobre el dict
+    y se escriben en segundo plano tras DEMORA_GUARDADO segundos sin cambios (varios cambios
+    seguidos = una sola escritura). Se escribe a un .tmp y se reemplaza con os.replace, así
+    un corte a medias nunca deja el archivo truncado. Las escrituras van de a una: un guardado
+    al cerrar espera al que el temporizador tenga en curso."""
+    
+    DEMORA_GUARDADO = 0.5
+    
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self._lock = threading.Lock()
+        self._lock_escritura = threading.Lock()  # Una escritura a la vez sobre el .tmp
+        self._temporizador = None
+        self._datos = {}
+        if os.path.isfile(ruta):
+            try:
+                with open(ruta, "r", encoding="utf-8") as f:
+                    datos = json.load(f)
+                if isinstance(datos, dict):
+                    self._datos = datos
+            except Exception:
+                pass
+    
+    def get(self, clave, por_defecto=None):
+        with self._lock:
+            return self._datos.get(clave, por_defecto)
+    
+    def actualizar(self, **cambios):
+        """Cambia valores en memoria y programa el guardado."""
+        with self._lock:
+            self._datos.update(cambios)
+            if self._temporizador is not None:
+                self._temporizador.cancel()
+            self._temporizador = threading.Timer(self.DEMORA_GUARDADO, self.guardar_ahora)
+            self._temporizador.daemon = True
+            self._temporizador.start()
+    
+    def guardar_ahora(self):
+        """Escribe los cambios pendientes (si los hay) de forma atómica.
+        Si otro hilo está escribiendo, espera a que termine antes de volver."""
+        # El lock de escritura se toma antes de la copia: así, si no queda nada pendiente,
+        # es porque la escritura que lo guardó ya terminó
+        with self._lock_escritura:
+            with self._lock:
+                if self._temporizador is None:
+                    return
+                self._temporizador.cancel()
+                self._temporizador = None
+                contenido = json.dumps(self._datos, ensure_ascii=False)
+            temporal = self.ruta + ".tmp"
+            try:
+                with open(temporal, "w", encoding="utf-8") as f:
+                    f.write(contenido)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(temporal, self.ruta)
+            except Exception as e:
+                print(f"Error al guardar la configuración: {e}")
+
+
+_config_tema = None
+_config_tema_lock = threading.Lock()
+
+
+def obtener_config():
+    """Configuración compartida (se carga del disco la primera vez)."""
+    global _config_tema
+    with _config_tema_lock:
+        if _config_tema is None:
+            # AGENDA_RUTA_CONFIG permite usar otro archivo (benchmarks, pruebas)
+            ruta = os.environ.get("AGENDA_RUTA_CONFIG") or os.path.join(get_ruta_base(), CONFIG_TEMA_ARCHIVO)
+            _config_tema = ConfigTema(ruta)
+            # Que un cambio hecho justo antes de salir no se pierda
+            atexit.register(_config_tema.guardar_ahora)
+        return _config_tema
+
 
 def cargar_config_tema():
     """Carga tema, recordar_estilo y tamaño_ventana. Devuelve (tema_actual, tema_guardado, recordar_estilo, tamaño_ventana)."""
-    ruta = os.path.join(get_ruta_base(), CONFIG_TEMA_ARCHIVO)
-    tema_guardado = "Kawaii"
-    recordar_estilo = True
-    tamaño_ventana = "mediano"
-    if os.path.isfile(ruta):
-        try:
-            with open(ruta, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                tema_guardado = data.get("tema", "Kawaii")
-                if tema_guardado not in TEMAS:
-                    tema_guardado = "Azul" if tema_guardado == "Fútbol" else "Kawaii"
-                recordar_estilo = data.get("recordar_estilo", True)
-                t = data.get("tamaño_ventana", "mediano")
-                if t in ("completa", "mediano", "pequeño"):
-                    tamaño_ventana = t
-        except Exception:
-            pass
+    config = obtener_config()
+    tema_guardado = config.get("tema", "Kawaii")
+    if tema_guardado not in TEMAS:
+        tema_guardado = "Azul" if tema_guardado == "Fútbol" else "Kawaii"
+    recordar_estilo = config.get("recordar_estilo", True)
+    tamaño_ventana = config.get("tamaño_ventana", "mediano")
+    if tamaño_ventana not in ("completa", "mediano", "pequeño"):
+        tamaño_ventana = "mediano"
     tema_inicial = tema_guardado if recordar_estilo else "Kawaii"
     return tema_inicial, tema_guardado, recordar_estilo, tamaño_ventana
 
@@ -153,29 +294,390 @@ def cargar_tema_guardado():
     return tema_inicial
 
 
-def guardar_tema(tema=None, recordar_estilo=None, tamaño_ventana=None):
-    """Guarda tema, recordar_estilo y/o tamaño_ventana en config."""
-    ruta = os.path.join(get_ruta_base(), CONFIG_TEMA_ARCHIVO)
-    data = {}
-    if os.path.isfile(ruta):
-        try:
-            with open(ruta, "r", encoding="utf-8") as f:
-                data = json.load(f)
-        except Exception:
-            pass
+def cargar_calidad_efectos():
+    """Carga la calidad de efectos guardada ("automatica" si no hay)."""
+    calidad = obtener_config().get("calidad_efectos", "automatica")
+    return calidad if calidad in CALIDADES_EFECTOS.values() else "automatica"
+
+
+def cargar_backend_notificaciones():
+    """Backend de notificaciones elegido en config ("kawaii" si no hay)."""
+    backend = obtener_config().get("notificaciones", "kawaii")
+    return backend if backend in BACKENDS_NOTIFICACION else "kawaii"
+
+
+def guardar_tema(tema=None, recordar_estilo=None, tamaño_ventana=None, calidad_efectos=None):
+    """Guarda tema, recordar_estilo, tamaño_ventana y/o calidad_efectos en config (en segundo plano)."""
+    cambios = {}
     if tema is not None and tema in TEMAS:
-        data["tema"] = tema
+        cambios["tema"] = tema
     if recordar_estilo is not None:
-        data["recordar_estilo"] = bool(recordar_estilo)
+        cambios["recordar_estilo"] = bool(recordar_estilo)
     if tamaño_ventana is not None and tamaño_ventana in ("completa", "mediano", "pequeño"):
-        data["tamaño_ventana"] = tamaño_ventana
-    if not data.get("recordar_estilo") and "recordar_estilo" not in data:
-        data["recordar_estilo"] = True
+        cambios["tamaño_ventana"] = tamaño_ventana
+    if calidad_efectos is not None and calidad_efectos in CALIDADES_EFECTOS.values():
+        cambios["calidad_efectos"] = calidad_efectos
+    config = obtener_config()
+    if "recordar_estilo" not in cambios and config.get("recordar_estilo") is None:
+        cambios["recordar_estilo"] = True
+    config.actualizar(**cambios)
+
+
+# Orden de importancia para ordenar la lista (columna importancia_rango)
+RANGOS_IMPORTANCIA = {"Urgente": 1, "Importante": 2, "Normal": 3}
+RANGO_IMPORTANCIA_OTRA = 4
+
+
+def rango_importancia(importancia):
+    """Devuelve el rango numérico usado para ordenar por importancia."""
+    return RANGOS_IMPORTANCIA.get(importancia, RANGO_IMPORTANCIA_OTRA)
+
+
+def leer_fecha(texto):
+    """Convierte un texto 'AAAA-MM-DD HH:MM:SS' de la base en datetime (None si no es válido).
+    fromisoformat es bastante más rápido que strptime."""
+    if not texto:
+        return None
     try:
-        with open(ruta, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False)
-    except Exception:
-        pass
+        return datetime.fromisoformat(texto)
+    except (TypeError, ValueError):
+        return None
+
+
+def componentes_recordatorio(fecha_recordatorio):
+    """Descompone un recordatorio en (ordinal del día, minuto del día) para las consultas.
+    Las tareas permanentes antiguas guardadas solo con 'HH:MM' quedan con día 0 (siempre vigentes)."""
+    if not fecha_recordatorio:
+        return None, None
+    momento = leer_fecha(fecha_recordatorio)
+    if momento is not None:
+        return momento.toordinal(), momento.hour * 60 + momento.minute
+    try:
+        hora = datetime.strptime(fecha_recordatorio[:5], "%H:%M")
+        return 0, hora.hour * 60 + hora.minute
+    except (TypeError, ValueError):
+        return None, None
+
+
+def proxima_ocurrencia_diaria(recordatorio_dia, recordatorio_minuto, desde):
+    """Próximo momento (desde el minuto de 'desde' inclusive) de un recordatorio diario."""
+    desde = desde.replace(second=0, microsecond=0)
+    dia = max(recordatorio_dia, desde.toordinal())
+    momento = datetime.fromordinal(dia) + timedelta(minutes=recordatorio_minuto)
+    if momento < desde:
+        momento += timedelta(days=1)
+    return momento
+
+
+def proxima_ocurrencia(fecha_recordatorio, es_permanente, ahora):
+    """Momento (datetime sin zona, hora de Chile) en que debe sonar un recordatorio.
+    Para tareas permanentes es la próxima vez a esa hora desde la fecha de inicio;
+    para tareas normales, la fecha/hora guardada. None si el formato no es válido."""
+    if es_permanente:
+        dia, minuto = componentes_recordatorio(fecha_recordatorio)
+        if dia is None:
+            return None
+        return proxima_ocurrencia_diaria(dia, minuto, ahora)
+    return leer_fecha(fecha_recordatorio)
+
+
+def _columnas_tabla(conn, tabla):
+    """Nombres de las columnas de una tabla."""
+    return {fila[1] for fila in conn.execute(f"PRAGMA table_info({tabla})")}
+
+
+def _migracion_esquema_base(conn):
+    """v1: tabla tareas con todas sus columnas (también para bases antiguas sin importancia/es_permanente)."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS tareas (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            titulo TEXT NOT NULL,
+            descripcion TEXT,
+            fecha_creacion TEXT NOT NULL,
+            fecha_recordatorio TEXT,
+            completada INTEGER DEFAULT 0,
+            notificacion_sistema INTEGER DEFAULT 1,
+            notificacion_correo INTEGER DEFAULT 0,
+            importancia TEXT DEFAULT 'Normal',
+            es_permanente INTEGER DEFAULT 0
+        )
+    ''')
+    columnas = _columnas_tabla(conn, "tareas")
+    if "importancia" not in columnas:
+        conn.execute("ALTER TABLE tareas ADD COLUMN importancia TEXT DEFAULT 'Normal'")
+    if "es_permanente" not in columnas:
+        conn.execute("ALTER TABLE tareas ADD COLUMN es_permanente INTEGER DEFAULT 0")
+
+
+def _migracion_indices_listado(conn):
+    """v2: rango entero de importancia e índices para la lista y los recordatorios."""
+    conn.execute(f"ALTER TABLE tareas ADD COLUMN importancia_rango INTEGER NOT NULL DEFAULT {RANGO_IMPORTANCIA_OTRA}")
+    conn.executemany(
+        "UPDATE tareas SET importancia_rango = ? WHERE importancia = ?",
+        [(rango, importancia) for importancia, rango in RANGOS_IMPORTANCIA.items()]
+    )
+    # La lista se recorre en el orden del índice (sin ordenar en memoria)
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_tareas_listado
+        ON tareas (completada, importancia_rango, fecha_recordatorio, fecha_creacion DESC)
+    ''')
+    # Índice parcial: solo tareas pendientes con recordatorio
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_tareas_recordatorio_pendiente
+        ON tareas (fecha_recordatorio)
+        WHERE completada = 0 AND fecha_recordatorio IS NOT NULL
+    ''')
+
+
+def _migracion_componentes_recordatorio(conn):
+    """v3: día (ordinal) y minuto del recordatorio como enteros, para filtrar tareas permanentes en SQL."""
+    conn.execute("ALTER TABLE tareas ADD COLUMN recordatorio_dia INTEGER")
+    conn.execute("ALTER TABLE tareas ADD COLUMN recordatorio_minuto INTEGER")
+    filas = conn.execute("SELECT id, fecha_recordatorio FROM tareas WHERE fecha_recordatorio IS NOT NULL").fetchall()
+    conn.executemany(
+        "UPDATE tareas SET recordatorio_dia = ?, recordatorio_minuto = ? WHERE id = ?",
+        [(*componentes_recordatorio(fecha), tarea_id) for tarea_id, fecha in filas]
+    )
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_tareas_permanentes_minuto
+        ON tareas (recordatorio_minuto, recordatorio_dia)
+        WHERE completada = 0 AND es_permanente = 1
+    ''')
+
+
+def _migracion_estado_notificacion(conn):
+    """v4: próxima notificación pendiente y última entregada, para no repetir recordatorios."""
+    conn.execute("ALTER TABLE tareas ADD COLUMN proxima_notificacion TEXT")
+    conn.execute("ALTER TABLE tareas ADD COLUMN ultima_notificacion TEXT")
+    ahora = ahora_local()
+    filas = conn.execute('''
+        SELECT id, fecha_recordatorio, es_permanente FROM tareas
+        WHERE completada = 0 AND fecha_recordatorio IS NOT NULL
+    ''').fetchall()
+    valores = []
+    for tarea_id, fecha_recordatorio, es_permanente in filas:
+        momento = proxima_ocurrencia(fecha_recordatorio, es_permanente, ahora)
+        # Las tareas normales ya vencidas se notificaban en cada revisión: se dan por entregadas
+        if momento is not None and (es_permanente or momento > ahora):
+            valores.append((momento.strftime("%Y-%m-%d %H:%M:%S"), tarea_id))
+    conn.executemany("UPDATE tareas SET proxima_notificacion = ? WHERE id = ?", valores)
+    conn.execute("DROP INDEX IF EXISTS idx_tareas_permanentes_minuto")
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_tareas_proxima_notificacion
+        ON tareas (proxima_notificacion)
+        WHERE completada = 0 AND proxima_notificacion IS NOT NULL
+    ''')
+
+
+def _migracion_orden_paginado(conn):
+    """v5: columna de orden sin NULL para paginar la lista por clave (keyset)."""
+    conn.execute("ALTER TABLE tareas ADD COLUMN orden_recordatorio TEXT NOT NULL DEFAULT ''")
+    conn.execute("UPDATE tareas SET orden_recordatorio = fecha_recordatorio WHERE fecha_recordatorio IS NOT NULL")
+    conn.execute("DROP INDEX IF EXISTS idx_tareas_listado")
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_tareas_listado
+        ON tareas (completada, importancia_rango, orden_recordatorio, fecha_creacion DESC, id)
+    ''')
+
+
+def _migracion_busqueda_texto(conn):
+    """v6: índice de texto completo (FTS5) sobre título y descripción, sincronizado con triggers.
+    Si el SQLite instalado no trae FTS5 se omite y la búsqueda usa LIKE."""
+    try:
+        conn.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS tareas_fts USING fts5(
+                titulo, descripcion,
+                content='tareas', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2'
+            )
+        ''')
+    except sqlite3.OperationalError:
+        return  # SQLite sin FTS5
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS tareas_fts_insertar AFTER INSERT ON tareas BEGIN
+            INSERT INTO tareas_fts (rowid, titulo, descripcion) VALUES (new.id, new.titulo, new.descripcion);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS tareas_fts_eliminar AFTER DELETE ON tareas BEGIN
+            INSERT INTO tareas_fts (tareas_fts, rowid, titulo, descripcion)
+            VALUES ('delete', old.id, old.titulo, old.descripcion);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS tareas_fts_actualizar AFTER UPDATE OF titulo, descripcion ON tareas BEGIN
+            INSERT INTO tareas_fts (tareas_fts, rowid, titulo, descripcion)
+            VALUES ('delete', old.id, old.titulo, old.descripcion);
+            INSERT INTO tareas_fts (rowid, titulo, descripcion) VALUES (new.id, new.titulo, new.descripcion);
+        END
+    ''')
+    conn.execute("INSERT INTO tareas_fts (tareas_fts) VALUES ('rebuild')")
+
+
+def _migracion_notificaciones_utc(conn):
+    """v7: próxima y última notificación como segundos UTC (enteros) en lugar de texto en hora local,
+    para que las comparaciones sean entre enteros y los cambios de horario no dupliquen ni salten avisos.
+    Los textos guardados se interpretan en la zona horaria configurada."""
+    conn.execute("ALTER TABLE tareas ADD COLUMN proxima_notificacion_utc INTEGER")
+    conn.execute("ALTER TABLE tareas ADD COLUMN ultima_notificacion_utc INTEGER")
+    filas = conn.execute('''
+        SELECT id, proxima_notificacion, ultima_notificacion FROM tareas
+        WHERE proxima_notificacion IS NOT NULL OR ultima_notificacion IS NOT NULL
+    ''').fetchall()
+    conn.executemany(
+        "UPDATE tareas SET proxima_notificacion_utc = ?, ultima_notificacion_utc = ? WHERE id = ?",
+        [(a_epoch(leer_fecha(proxima)), a_epoch(leer_fecha(ultima)), tarea_id) for tarea_id, proxima, ultima in filas]
+    )
+    conn.execute("DROP INDEX IF EXISTS idx_tareas_proxima_notificacion")
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_tareas_proxima_notificacion_utc
+        ON tareas (proxima_notificacion_utc)
+        WHERE completada = 0 AND proxima_notificacion_utc IS NOT NULL
+    ''')
+    try:
+        conn.execute("ALTER TABLE tareas DROP COLUMN proxima_notificacion")
+        conn.execute("ALTER TABLE tareas DROP COLUMN ultima_notificacion")
+    except sqlite3.OperationalError:
+        pass  # SQLite anterior a 3.35 (sin DROP COLUMN): las columnas de texto quedan sin uso
+
+
+def _migracion_quitar_indice_recordatorio(conn):
+    """v8: quita el índice parcial por fecha_recordatorio de la v2; desde la v4 las notificaciones
+    se buscan por la próxima notificación y ese índice solo costaba una escritura más por cambio."""
+    conn.execute("DROP INDEX IF EXISTS idx_tareas_recordatorio_pendiente")
+
+
+# Migraciones del esquema, en orden. PRAGMA user_version guarda cuántas se aplicaron.
+# Para cambiar el esquema agrega una función al final (nunca modifiques las anteriores).
+MIGRACIONES = (
+    _migracion_esquema_base,
+    _migracion_indices_listado,
+    _migracion_componentes_recordatorio,
+    _migracion_estado_notificacion,
+    _migracion_orden_paginado,
+    _migracion_busqueda_texto,
+    _migracion_notificaciones_utc,
+    _migracion_quitar_indice_recordatorio,
+)
+
+# Minutos que se retrasa un recordatorio al pulsar "Posponer"
+MINUTOS_POSPONER = 10
+
+
+class GestorConexiones:
+    """Mantiene una conexión SQLite persistente por hilo (UI, recordatorios, etc.).
+    Evita abrir y cerrar el archivo en cada consulta y aplica modo WAL para que
+    el hilo de recordatorios pueda leer mientras la interfaz escribe."""
+    
+    PRAGMAS = (
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",   # Seguro con WAL y mucho más rápido que FULL
+        "PRAGMA cache_size=-16000",    # ~16 MB de caché de páginas
+        "PRAGMA mmap_size=268435456",  # 256 MB mapeados en memoria
+        "PRAGMA temp_store=MEMORY",
+        "PRAGMA foreign_keys=ON",
+    )
+    
+    def __init__(self, db_name):
+        self.db_name = db_name
+        self._local = threading.local()
+        self._conexiones = []
+        self._lock = threading.Lock()
+        self._cerrado = False
+    
+    def obtener(self):
+        """Devuelve la conexión del hilo actual (la crea la primera vez)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            return conn
+        with self._lock:
+            if self._cerrado:
+                raise sqlite3.ProgrammingError("La base de datos ya fue cerrada")
+            # check_same_thread=False solo para poder cerrarla desde el hilo principal al salir
+            conn = sqlite3.connect(self.db_name, timeout=10, check_same_thread=False)
+            for pragma in self.PRAGMAS:
+                try:
+                    conn.execute(pragma)
+                except sqlite3.DatabaseError:
+                    pass  # PRAGMA no soportado en esta versión de SQLite
+            self._conexiones.append(conn)
+        self._local.conn = conn
+        return conn
+    
+    def cerrar_todas(self):
+        """Cierra todas las conexiones abiertas (se llama al salir de la aplicación)."""
+        with self._lock:
+            self._cerrado = True
+            conexiones, self._conexiones = self._conexiones, []
+        for conn in conexiones:
+            try:
+                conn.execute("PRAGMA optimize")
+                conn.close()
+            except sqlite3.Error:
+                pass
+        self._local = threading.local()
+
+
+# Columnas de las consultas que devuelven tareas, en el orden de los argumentos de Tarea
+CAMPOS_TAREA = (
+    "id", "titulo", "descripcion", "fecha_creacion", "fecha_recordatorio", "completada",
+    "notificacion_sistema", "notificacion_correo", "importancia", "es_permanente", "proxima_notificacion_utc",
+)
+COLUMNAS_TAREA = ", ".join(CAMPOS_TAREA)
+
+# Marca de "todavía no calculado" para los valores que Tarea calcula al primer uso
+_SIN_CALCULAR = object()
+
+
+class Tarea:
+    """Una tarea leída de la base (la fábrica de filas de Database crea una por fila).
+    Con __slots__ no hay un dict por instancia; la clave de orden y el recordatorio como datetime
+    se calculan al primer uso y quedan guardados. proxima_notificacion va en segundos UTC."""
+    
+    __slots__ = ("id", "titulo", "descripcion", "fecha_creacion", "fecha_recordatorio", "completada",
+                 "notif_sistema", "notif_correo", "importancia", "es_permanente", "proxima_notificacion",
+                 "_clave", "_momento_recordatorio")
+    
+    def __init__(self, tarea_id, titulo, descripcion, fecha_creacion, fecha_recordatorio, completada,
+                 notif_sistema, notif_correo, importancia, es_permanente, proxima_notificacion=None):
+        self.id = tarea_id
+        self.titulo = titulo
+        self.descripcion = descripcion
+        self.fecha_creacion = fecha_creacion
+        self.fecha_recordatorio = fecha_recordatorio
+        self.completada = bool(completada)
+        self.notif_sistema = bool(notif_sistema)
+        self.notif_correo = bool(notif_correo)
+        self.importancia = importancia
+        self.es_permanente = bool(es_permanente)
+        self.proxima_notificacion = proxima_notificacion
+        self._clave = None
+        self._momento_recordatorio = _SIN_CALCULAR
+    
+    @staticmethod
+    def desde_fila(cursor, fila):
+        """row_factory de sqlite3 para consultas que seleccionan COLUMNAS_TAREA."""
+        return Tarea(*fila)
+    
+    @property
+    def clave(self):
+        """Clave de orden de la lista: reproduce el ORDER BY de Database.obtener_tareas."""
+        if self._clave is None:
+            self._clave = (
+                rango_importancia(self.importancia),
+                self.fecha_recordatorio or "",
+                # fecha_creacion DESC: "AAAA-MM-DD HH:MM:SS" como un solo entero negativo (AAAAMMDDHHMMSS)
+                -int(re.sub(r"\D", "", self.fecha_creacion or "") or 0),
+                self.id,
+            )
+        return self._clave
+    
+    @property
+    def momento_recordatorio(self):
+        """fecha_recordatorio como datetime (None si no tiene o es una hora suelta antigua)."""
+        if self._momento_recordatorio is _SIN_CALCULAR:
+            self._momento_recordatorio = leer_fecha(self.fecha_recordatorio)
+        return self._momento_recordatorio
 
 
 class Database:
@@ -183,116 +685,198 @@ class Database:
     
     def __init__(self, db_name="tareas.db"):
         self.db_name = db_name
-        # Zona horaria de Chile
-        self.tz_chile = pytz.timezone('America/Santiago')
+        self.conexiones = GestorConexiones(db_name)
         self.init_db()
     
+    def _conexion(self):
+        """Conexión persistente del hilo actual."""
+        return self.conexiones.obtener()
+    
+    def cerrar(self):
+        """Cierra las conexiones de todos los hilos."""
+        self.conexiones.cerrar_todas()
+    
+    def _leer_tareas(self, consulta, parametros=()):
+        """Ejecuta una consulta que selecciona COLUMNAS_TAREA y devuelve objetos Tarea."""
+        cursor = self._conexion().cursor()
+        cursor.row_factory = Tarea.desde_fila
+        return cursor.execute(consulta, parametros).fetchall()
+    
     def init_db(self):
-        """Inicializa la base de datos y crea la tabla si no existe"""
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS tareas (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                titulo TEXT NOT NULL,
-                descripcion TEXT,
-                fecha_creacion TEXT NOT NULL,
-                fecha_recordatorio TEXT,
-                completada INTEGER DEFAULT 0,
-                notificacion_sistema INTEGER DEFAULT 1,
-                notificacion_correo INTEGER DEFAULT 0,
-                importancia TEXT DEFAULT 'Normal'
-            )
-        ''')
-        
-        # Agregar columna importancia si no existe (para bases de datos existentes)
-        try:
-            cursor.execute('ALTER TABLE tareas ADD COLUMN importancia TEXT DEFAULT "Normal"')
-        except sqlite3.OperationalError:
-            pass  # La columna ya existe
-        
-        # Agregar columna es_permanente si no existe (para tareas recurrentes diarias)
-        try:
-            cursor.execute('ALTER TABLE tareas ADD COLUMN es_permanente INTEGER DEFAULT 0')
-        except sqlite3.OperationalError:
-            pass  # La columna ya existe
-        
-        conn.commit()
-        conn.close()
+        """Inicializa la base de datos y aplica las migraciones pendientes"""
+        conn = self._conexion()
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        for numero, migracion in enumerate(MIGRACIONES[version:], start=version + 1):
+            # Cada migración es atómica: si falla, la versión no avanza
+            with conn:
+                conn.execute("BEGIN")
+                migracion(conn)
+                conn.execute(f"PRAGMA user_version = {numero}")
+        self.tiene_fts = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'tareas_fts'"
+        ).fetchone() is not None
     
     def agregar_tarea(self, titulo, descripcion, fecha_recordatorio=None, 
                      notif_sistema=True, notif_correo=False, importancia='Normal', es_permanente=False):
         """Agrega una nueva tarea a la base de datos"""
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
+        conn = self._conexion()
         # Usar hora de Chile
-        tz_chile = pytz.timezone('America/Santiago')
-        fecha_creacion = datetime.now(tz_chile).strftime("%Y-%m-%d %H:%M:%S")
-        cursor.execute('''
-            INSERT INTO tareas (titulo, descripcion, fecha_creacion, 
-                              fecha_recordatorio, notificacion_sistema, 
-                              notificacion_correo, importancia, es_permanente)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (titulo, descripcion, fecha_creacion, fecha_recordatorio, 
-              int(notif_sistema), int(notif_correo), importancia, int(es_permanente)))
-        conn.commit()
-        tarea_id = cursor.lastrowid
-        conn.close()
-        return tarea_id
+        fecha_creacion = self._ahora().strftime("%Y-%m-%d %H:%M:%S")
+        recordatorio_dia, recordatorio_minuto = componentes_recordatorio(fecha_recordatorio)
+        proxima_notificacion = self._proxima_notificacion(fecha_recordatorio, es_permanente)
+        with conn:
+            cursor = conn.execute('''
+                INSERT INTO tareas (titulo, descripcion, fecha_creacion, 
+                                  fecha_recordatorio, notificacion_sistema, 
+                                  notificacion_correo, importancia, importancia_rango, es_permanente,
+                                  recordatorio_dia, recordatorio_minuto, proxima_notificacion_utc,
+                                  orden_recordatorio)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (titulo, descripcion, fecha_creacion, fecha_recordatorio, 
+                  int(notif_sistema), int(notif_correo), importancia,
+                  rango_importancia(importancia), int(es_permanente),
+                  recordatorio_dia, recordatorio_minuto, proxima_notificacion,
+                  fecha_recordatorio or ""))
+        return cursor.lastrowid
     
     def obtener_tareas(self, completadas=False):
         """Obtiene todas las tareas (completadas o pendientes)"""
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT id, titulo, descripcion, fecha_creacion, fecha_recordatorio,
-                   completada, notificacion_sistema, notificacion_correo, importancia, es_permanente
+        return self._leer_tareas(f'''
+            SELECT {COLUMNAS_TAREA}
             FROM tareas
             WHERE completada = ?
-            ORDER BY 
-                CASE importancia
-                    WHEN 'Urgente' THEN 1
-                    WHEN 'Importante' THEN 2
-                    WHEN 'Normal' THEN 3
-                    ELSE 4
-                END,
-                fecha_recordatorio ASC, fecha_creacion DESC
+            ORDER BY importancia_rango, orden_recordatorio, fecha_creacion DESC, id
         ''', (int(completadas),))
-        tareas = cursor.fetchall()
-        conn.close()
-        return tareas
+    
+    def buscar_tareas(self, texto, limite=500, completadas=False):
+        """Busca tareas por título y descripción (prefijos de palabra, sin importar tildes).
+        Devuelve tareas como obtener_tareas, de la más a la menos relevante."""
+        palabras = re.findall(r"\w+", texto)
+        if not palabras:
+            return []
+        columnas = "SELECT " + ", ".join(f"t.{campo}" for campo in CAMPOS_TAREA)
+        if self.tiene_fts:
+            # Cada palabra como prefijo ("pal"*); el título pesa más que la descripción
+            consulta = " ".join(f'"{palabra}"*' for palabra in palabras)
+            return self._leer_tareas(columnas + '''
+                FROM tareas_fts
+                JOIN tareas t ON t.id = tareas_fts.rowid
+                WHERE tareas_fts MATCH ? AND t.completada = ?
+                ORDER BY bm25(tareas_fts, 10.0, 1.0)
+                LIMIT ?
+            ''', (consulta, int(completadas), limite))
+        condiciones = " AND ".join("(t.titulo LIKE ? OR t.descripcion LIKE ?)" for _ in palabras)
+        parametros = [f"%{palabra}%" for palabra in palabras for _ in range(2)]
+        return self._leer_tareas(columnas + f'''
+            FROM tareas t
+            WHERE {condiciones} AND t.completada = ?
+            ORDER BY t.importancia_rango, t.orden_recordatorio, t.fecha_creacion DESC, t.id
+            LIMIT ?
+        ''', (*parametros, int(completadas), limite))
+    
+    def obtener_pagina_tareas(self, despues_de=None, antes_de=None, desplazamiento=0,
+                              limite=100, completadas=False):
+        """Obtiene una página de tareas en el orden de obtener_tareas.
+        despues_de / antes_de: clave (importancia_rango, orden_recordatorio, fecha_creacion, id)
+        de la última/primera fila ya cargada; la página se busca por clave en el índice (keyset).
+        Sin clave se usa desplazamiento (saltos de la barra de desplazamiento)."""
+        columnas = f"SELECT {COLUMNAS_TAREA} FROM tareas"
+        if despues_de is not None:
+            rango, orden, creacion, tarea_id = despues_de
+            return self._leer_tareas(columnas + '''
+                WHERE completada = ? AND (importancia_rango, orden_recordatorio) >= (?, ?)
+                  AND NOT (importancia_rango = ? AND orden_recordatorio = ?
+                           AND (fecha_creacion > ? OR (fecha_creacion = ? AND id <= ?)))
+                ORDER BY importancia_rango, orden_recordatorio, fecha_creacion DESC, id
+                LIMIT ?
+            ''', (int(completadas), rango, orden, rango, orden, creacion, creacion, tarea_id, limite))
+        if antes_de is not None:
+            rango, orden, creacion, tarea_id = antes_de
+            return self._leer_tareas(columnas + '''
+                WHERE completada = ? AND (importancia_rango, orden_recordatorio) <= (?, ?)
+                  AND NOT (importancia_rango = ? AND orden_recordatorio = ?
+                           AND (fecha_creacion < ? OR (fecha_creacion = ? AND id >= ?)))
+                ORDER BY importancia_rango DESC, orden_recordatorio DESC, fecha_creacion, id DESC
+                LIMIT ?
+            ''', (int(completadas), rango, orden, rango, orden, creacion, creacion, tarea_id, limite))[::-1]
+        return self._leer_tareas(columnas + '''
+            WHERE completada = ?
+            ORDER BY importancia_rango, orden_recordatorio, fecha_creacion DESC, id
+            LIMIT ? OFFSET ?
+        ''', (int(completadas), limite, max(0, desplazamiento)))
     
     def marcar_completada(self, tarea_id):
         """Marca una tarea como completada"""
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        cursor.execute('''
-            UPDATE tareas SET completada = 1 WHERE id = ?
-        ''', (tarea_id,))
-        conn.commit()
-        conn.close()
+        self.marcar_completadas([tarea_id])
     
     def eliminar_tarea(self, tarea_id):
         """Elimina una tarea de la base de datos"""
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        cursor.execute('DELETE FROM tareas WHERE id = ?', (tarea_id,))
-        conn.commit()
-        conn.close()
+        self.eliminar_tareas([tarea_id])
+    
+    # --- Operaciones en lote: una sola transacción para muchas tareas ---
+    
+    def agregar_tareas(self, tareas):
+        """Agrega muchas tareas de una vez. Cada tarea es un dict con las claves de agregar_tarea
+        (titulo, descripcion, fecha_recordatorio, notif_sistema, notif_correo, importancia, es_permanente).
+        Devuelve la lista de ids creados."""
+        if not tareas:
+            return []
+        fecha_creacion = self._ahora().strftime("%Y-%m-%d %H:%M:%S")
+        filas = []
+        for tarea in tareas:
+            fecha_recordatorio = tarea.get("fecha_recordatorio")
+            es_permanente = bool(tarea.get("es_permanente", False))
+            importancia = tarea.get("importancia", "Normal")
+            filas.append((
+                tarea["titulo"], tarea.get("descripcion", ""), fecha_creacion, fecha_recordatorio,
+                int(tarea.get("notif_sistema", True)), int(tarea.get("notif_correo", False)),
+                importancia, rango_importancia(importancia), int(es_permanente),
+                *componentes_recordatorio(fecha_recordatorio),
+                self._proxima_notificacion(fecha_recordatorio, es_permanente),
+                fecha_recordatorio or "",
+            ))
+        conn = self._conexion()
+        with conn:
+            conn.executemany('''
+                INSERT INTO tareas (titulo, descripcion, fecha_creacion, 
+                                  fecha_recordatorio, notificacion_sistema, 
+                                  notificacion_correo, importancia, importancia_rango, es_permanente,
+                                  recordatorio_dia, recordatorio_minuto, proxima_notificacion_utc,
+                                  orden_recordatorio)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', filas)
+            # Dentro de la transacción los ids son consecutivos
+            ultimo = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+        return list(range(ultimo - len(filas) + 1, ultimo + 1))
+    
+    def marcar_completadas(self, tarea_ids):
+        """Marca varias tareas como completadas en una sola transacción"""
+        conn = self._conexion()
+        with conn:
+            conn.executemany(
+                "UPDATE tareas SET completada = 1 WHERE id = ?", [(tarea_id,) for tarea_id in tarea_ids]
+            )
+    
+    def eliminar_tareas(self, tarea_ids):
+        """Elimina varias tareas en una sola transacción"""
+        conn = self._conexion()
+        with conn:
+            conn.executemany("DELETE FROM tareas WHERE id = ?", [(tarea_id,) for tarea_id in tarea_ids])
+    
+    def actualizar_importancia(self, tarea_ids, importancia):
+        """Cambia la importancia de varias tareas en una sola transacción"""
+        rango = rango_importancia(importancia)
+        conn = self._conexion()
+        with conn:
+            conn.executemany(
+                "UPDATE tareas SET importancia = ?, importancia_rango = ? WHERE id = ?",
+                [(importancia, rango, tarea_id) for tarea_id in tarea_ids]
+            )
     
     def obtener_tarea_por_id(self, tarea_id):
-        """Obtiene una tarea específica por su ID"""
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT id, titulo, descripcion, fecha_creacion, fecha_recordatorio,
-                   completada, notificacion_sistema, notificacion_correo, importancia, es_permanente
-            FROM tareas
-            WHERE id = ?
-        ''', (tarea_id,))
-        tarea = cursor.fetchone()
-        conn.close()
-        return tarea
+        """Obtiene una tarea específica por su ID (Tarea, o None si no existe)"""
+        tareas = self._leer_tareas(f"SELECT {COLUMNAS_TAREA} FROM tareas WHERE id = ?", (tarea_id,))
+        return tareas[0] if tareas else None
     
     def actualizar_tarea(self, tarea_id, titulo=None, descripcion=None, 
                         fecha_recordatorio=None, notif_sistema=None, 
@@ -308,9 +892,6 @@ class Database:
         - Actualizar título y descripción:
           db.actualizar_tarea(1, titulo="Nuevo título", descripcion="Nueva descripción")
         """
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        
         # Construir la consulta UPDATE dinámicamente según los campos proporcionados
         campos_actualizar = []
         valores = []
@@ -326,6 +907,13 @@ class Database:
         if fecha_recordatorio is not None:
             campos_actualizar.append("fecha_recordatorio = ?")
             valores.append(fecha_recordatorio)
+            recordatorio_dia, recordatorio_minuto = componentes_recordatorio(fecha_recordatorio)
+            campos_actualizar.append("recordatorio_dia = ?")
+            valores.append(recordatorio_dia)
+            campos_actualizar.append("recordatorio_minuto = ?")
+            valores.append(recordatorio_minuto)
+            campos_actualizar.append("orden_recordatorio = ?")
+            valores.append(fecha_recordatorio)
         
         if notif_sistema is not None:
             campos_actualizar.append("notificacion_sistema = ?")
@@ -338,6 +926,8 @@ class Database:
         if importancia is not None:
             campos_actualizar.append("importancia = ?")
             valores.append(importancia)
+            campos_actualizar.append("importancia_rango = ?")
+            valores.append(rango_importancia(importancia))
         
         if es_permanente is not None:
             campos_actualizar.append("es_permanente = ?")
@@ -347,248 +937,1292 @@ class Database:
         if campos_actualizar:
             valores.append(tarea_id)  # Agregar el ID al final para el WHERE
             consulta = f"UPDATE tareas SET {', '.join(campos_actualizar)} WHERE id = ?"
-            cursor.execute(consulta, valores)
-            conn.commit()
-        
-        conn.close()
+            conn = self._conexion()
+            with conn:
+                consulta_recordatorio = "SELECT fecha_recordatorio, es_permanente FROM tareas WHERE id = ?"
+                antes = conn.execute(consulta_recordatorio, (tarea_id,)).fetchone()
+                conn.execute(consulta, valores)
+                despues = conn.execute(consulta_recordatorio, (tarea_id,)).fetchone()
+                # Reprogramar solo si cambió el recordatorio: editar el título o la descripción
+                # no debe volver a armar una notificación ya entregada
+                if (antes is not None and despues is not None
+                        and (antes[0], bool(antes[1])) != (despues[0], bool(despues[1]))):
+                    conn.execute(
+                        "UPDATE tareas SET proxima_notificacion_utc = ? WHERE id = ?",
+                        (self._proxima_notificacion(despues[0], despues[1]), tarea_id)
+                    )
+    
+    def _ahora(self):
+        """Hora actual en la zona configurada, sin zona (como se guardan las fechas de texto)."""
+        return ahora_local()
+    
+    def _proxima_notificacion(self, fecha_recordatorio, es_permanente, desde=None):
+        """Segundos UTC de la próxima notificación pendiente (None si no hay recordatorio)."""
+        return a_epoch(proxima_ocurrencia(fecha_recordatorio, es_permanente, desde or self._ahora()))
+    
+    def obtener_pendientes(self, tarea_ids=None):
+        """Tareas pendientes, sin orden (las carga AlmacenTareas).
+        Con tarea_ids, solo esas (en grupos, por el límite de parámetros de SQLite)."""
+        consulta = f"SELECT {COLUMNAS_TAREA} FROM tareas WHERE completada = 0"
+        if tarea_ids is None:
+            return self._leer_tareas(consulta)
+        tarea_ids = list(tarea_ids)
+        tareas = []
+        for inicio in range(0, len(tarea_ids), 500):
+            grupo = tarea_ids[inicio:inicio + 500]
+            tareas.extend(self._leer_tareas(consulta + f" AND id IN ({','.join('?' * len(grupo))})", grupo))
+        return tareas
     
     def obtener_tareas_pendientes_recordatorio(self):
-        """Obtiene tareas pendientes que tienen recordatorio programado.
-        Para tareas permanentes, verifica si la hora coincide (ignorando la fecha).
-        Para tareas normales, verifica fecha y hora específica."""
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        # Usar hora de Chile
-        tz_chile = pytz.timezone('America/Santiago')
-        ahora = datetime.now(tz_chile)
-        ahora_str = ahora.strftime("%Y-%m-%d %H:%M:%S")
-        hora_actual = ahora.strftime("%H:%M")
-        
-        # Obtener todas las tareas pendientes con recordatorio
-        cursor.execute('''
-            SELECT id, titulo, descripcion, fecha_recordatorio,
-                   notificacion_sistema, notificacion_correo, importancia, es_permanente
-            FROM tareas
-            WHERE completada = 0 AND fecha_recordatorio IS NOT NULL
-        ''')
-        todas_tareas = cursor.fetchall()
-        conn.close()
+        """Obtiene tareas pendientes con una notificación vencida y aún no entregada.
+        Tras notificarlas hay que llamar a registrar_notificacion para que no se repitan."""
+        # INDEXED BY: sin estadísticas (ANALYZE) el planificador prefiere idx_tareas_listado por
+        # completada y recorre todas las pendientes; el índice parcial lee solo las vencidas
+        return self._leer_tareas(f'''
+            SELECT {COLUMNAS_TAREA}
+            FROM tareas INDEXED BY idx_tareas_proxima_notificacion_utc
+            WHERE completada = 0 AND proxima_notificacion_utc IS NOT NULL
+              AND proxima_notificacion_utc <= ?
+            ORDER BY proxima_notificacion_utc
+        ''', (int(time.time()),))
+    
+    def registrar_notificacion(self, tarea_ids):
+        """Marca como entregada la notificación actual de cada tarea.
+        Las tareas permanentes pasan a su siguiente día; las normales quedan sin notificación pendiente.
+        Solo avanzan las que siguen vencidas: si la tarea se editó o se pospuso mientras se
+        notificaba, su nueva notificación se conserva."""
+        if not tarea_ids:
+            return
+        tarea_ids = list(tarea_ids)
+        ahora_utc = int(time.time())
+        # Las repeticiones diarias se calculan con la hora local (p. ej. todos los días a las 09:00)
+        siguiente_minuto = self._ahora().replace(second=0, microsecond=0) + timedelta(minutes=1)
+        conn = self._conexion()
+        with conn:
+            filas = []
+            # En grupos, por el límite de parámetros de SQLite
+            for inicio in range(0, len(tarea_ids), 500):
+                grupo = tarea_ids[inicio:inicio + 500]
+                filas.extend(conn.execute(f'''
+                    SELECT id, es_permanente, recordatorio_dia, recordatorio_minuto
+                    FROM tareas
+                    WHERE id IN ({','.join('?' * len(grupo))}) AND proxima_notificacion_utc <= ?
+                ''', (*grupo, ahora_utc)).fetchall())
+            valores = []
+            for tarea_id, es_permanente, recordatorio_dia, recordatorio_minuto in filas:
+                proxima = None
+                if es_permanente and recordatorio_dia is not None:
+                    proxima = a_epoch(proxima_ocurrencia_diaria(recordatorio_dia, recordatorio_minuto, siguiente_minuto))
+                valores.append((ahora_utc, proxima, tarea_id, ahora_utc))
+            conn.executemany('''
+                UPDATE tareas SET ultima_notificacion_utc = ?, proxima_notificacion_utc = ?
+                WHERE id = ? AND proxima_notificacion_utc <= ?
+            ''', valores)
+    
+    def posponer_recordatorio(self, tarea_id, minutos=MINUTOS_POSPONER):
+        """Vuelve a notificar la tarea dentro de 'minutos' minutos."""
+        proxima = int(time.time()) + minutos * 60
+        conn = self._conexion()
+        with conn:
+            conn.execute(
+                "UPDATE tareas SET proxima_notificacion_utc = ? WHERE id = ? AND completada = 0",
+                (proxima, tarea_id)
+            )
+
+
+class AlmacenTareas:
+    """Tareas pendientes en memoria, entre TodoApp y Database.
+    Las lecturas (lista, búsqueda, edición, recordatorios) se sirven desde memoria; cada escritura
+    va primero a la base (write-through) y luego se releen solo las tareas tocadas. Los suscriptores
+    (la lista y el planificador) reciben los ids que cambiaron."""
+    
+    def __init__(self, db):
+        self.db = db
+        self._por_id = {}         # tarea_id -> Tarea
+        self._orden = []          # claves de orden de la lista (importancia primero), ordenadas
+        self._por_proxima = []    # (proxima_notificacion en segundos UTC, tarea_id), ordenadas
+        # El planificador lee y escribe desde su hilo
+        self._lock = threading.RLock()
+        self._oyentes = []
+    
+    def cargar(self):
+        """Lee todas las tareas pendientes (una sola consulta)."""
+        tareas = self.db.obtener_pendientes()
+        with self._lock:
+            self._por_id = {tarea.id: tarea for tarea in tareas}
+            self._orden = sorted(tarea.clave for tarea in tareas)
+            self._por_proxima = sorted(
+                (tarea.proxima_notificacion, tarea.id) for tarea in tareas if tarea.proxima_notificacion is not None
+            )
+    
+    def suscribir(self, funcion):
+        """Registra funcion(ids, solo_recordatorio), llamada tras guardar un cambio.
+        solo_recordatorio=True: solo cambió la próxima notificación (la lista se ve igual)."""
+        self._oyentes.append(funcion)
+    
+    def _avisar(self, tarea_ids, solo_recordatorio=False):
+        for funcion in self._oyentes:
+            try:
+                funcion(tarea_ids, solo_recordatorio)
+            except Exception as e:
+                print(f"Error al avisar cambio de tareas: {e}")
+    
+    def _poner(self, tarea):
+        self._por_id[tarea.id] = tarea
+        bisect.insort(self._orden, tarea.clave)
+        if tarea.proxima_notificacion is not None:
+            bisect.insort(self._por_proxima, (tarea.proxima_notificacion, tarea.id))
+    
+    def _sacar(self, tarea_id):
+        tarea = self._por_id.pop(tarea_id, None)
+        if tarea is None:
+            return
+        del self._orden[bisect.bisect_left(self._orden, tarea.clave)]
+        if tarea.proxima_notificacion is not None:
+            del self._por_proxima[bisect.bisect_left(self._por_proxima, (tarea.proxima_notificacion, tarea.id))]
+    
+    def _recargar(self, tarea_ids):
+        """Relee las tareas recién guardadas (las que ya no están pendientes salen de memoria).
+        Se llama con el lock tomado, para que otro hilo no deje en memoria una lectura anterior."""
+        tareas = self.db.obtener_pendientes(tarea_ids)
+        for tarea_id in tarea_ids:
+            self._sacar(tarea_id)
+        for tarea in tareas:
+            self._poner(tarea)
+    
+    # --- Lecturas (desde memoria) ---
+    
+    # Las lecturas toman el lock: _recargar saca y vuelve a poner cada tarea desde el hilo
+    # del planificador, y en medio una lectura sin lock no la encontraría
+    
+    def __len__(self):
+        with self._lock:
+            return len(self._por_id)
+    
+    def obtener(self, tarea_id):
+        """La tarea pendiente con ese id, o None."""
+        with self._lock:
+            return self._por_id.get(tarea_id)
+    
+    def listar(self):
+        """Todas las tareas pendientes, en el orden de la lista."""
+        with self._lock:
+            return [self._por_id[clave[-1]] for clave in self._orden]
+    
+    def pagina(self, inicio, cantidad):
+        """Tareas de la lista desde la posición inicio (modo virtual)."""
+        with self._lock:
+            return [self._por_id[clave[-1]] for clave in self._orden[max(0, inicio):inicio + cantidad]]
+    
+    def buscar(self, texto):
+        """Resultados de Database.buscar_tareas (por relevancia) como tareas en memoria."""
+        ids = [tarea.id for tarea in self.db.buscar_tareas(texto)]
+        with self._lock:
+            return [self._por_id[tarea_id] for tarea_id in ids if tarea_id in self._por_id]
+    
+    def recordatorios_programados(self):
+        """(id, próxima notificación en segundos UTC) de las tareas con una notificación por entregar."""
+        with self._lock:
+            return [(tarea_id, proxima) for proxima, tarea_id in self._por_proxima]
+    
+    def proxima_notificacion(self, tarea_id):
+        """Próxima notificación (segundos UTC) de una tarea pendiente, o None si no tiene."""
+        with self._lock:
+            tarea = self._por_id.get(tarea_id)
+        return tarea.proxima_notificacion if tarea else None
+    
+    def vencidas(self):
+        """Tareas con la notificación vencida y aún no entregada, de la más antigua a la más nueva."""
+        ahora = int(time.time())
+        with self._lock:
+            fin = bisect.bisect_right(self._por_proxima, (ahora, float("inf")))
+            return [self._por_id[tarea_id] for _, tarea_id in self._por_proxima[:fin]]
+    
+    # --- Escrituras (primero en la base) ---
+    
+    def agregar(self, titulo, descripcion, fecha_recordatorio=None,
+                notif_sistema=True, notif_correo=False, importancia='Normal', es_permanente=False):
+        """Agrega una tarea (ver Database.agregar_tarea) y devuelve su id."""
+        with self._lock:
+            tarea_id = self.db.agregar_tarea(
+                titulo, descripcion, fecha_recordatorio, notif_sistema, notif_correo, importancia, es_permanente
+            )
+            self._recargar([tarea_id])
+        self._avisar([tarea_id])
+        return tarea_id
+    
+    def actualizar(self, tarea_id, **campos):
+        """Actualiza los campos indicados (ver Database.actualizar_tarea)."""
+        with self._lock:
+            self.db.actualizar_tarea(tarea_id, **campos)
+            self._recargar([tarea_id])
+        self._avisar([tarea_id])
+    
+    def completar(self, tarea_ids):
+        with self._lock:
+            self.db.marcar_completadas(tarea_ids)
+            for tarea_id in tarea_ids:
+                self._sacar(tarea_id)
+        self._avisar(tarea_ids)
+    
+    def eliminar(self, tarea_ids):
+        with self._lock:
+            self.db.eliminar_tareas(tarea_ids)
+            for tarea_id in tarea_ids:
+                self._sacar(tarea_id)
+        self._avisar(tarea_ids)
+    
+    def cambiar_importancia(self, tarea_ids, importancia):
+        with self._lock:
+            self.db.actualizar_importancia(tarea_ids, importancia)
+            self._recargar(tarea_ids)
+        self._avisar(tarea_ids)
+    
+    def registrar_notificacion(self, tarea_ids):
+        """Marca como entregadas las notificaciones (ver Database.registrar_notificacion)."""
+        if not tarea_ids:
+            return
+        with self._lock:
+            self.db.registrar_notificacion(tarea_ids)
+            self._recargar(tarea_ids)
+        self._avisar(tarea_ids, solo_recordatorio=True)
+    
+    def posponer(self, tarea_id, minutos=MINUTOS_POSPONER):
+        with self._lock:
+            self.db.posponer_recordatorio(tarea_id, minutos)
+            self._recargar([tarea_id])
+        self._avisar([tarea_id], solo_recordatorio=True)
+
+
+def resumir_avisos(avisos, max_titulos=5):
+    """Título, mensaje y acción de posponer de una notificación que agrupa varios avisos."""
+    titulos = [f"• {titulo}" for titulo, _, _ in avisos[:max_titulos]]
+    if len(avisos) > max_titulos:
+        titulos.append(f"... y {len(avisos) - max_titulos} más")
+    acciones = [al_posponer for _, _, al_posponer in avisos if al_posponer]
+    
+    def posponer_todas():
+        for al_posponer in acciones:
+            al_posponer()
+    
+    return f"Tienes {len(avisos)} recordatorios", "\n".join(titulos), posponer_todas if acciones else None
+
+
+class RelojAnimacion:
+    """Un solo reloj (root.after) mueve todos los efectos activos: brillos y entradas de todas
+    las notificaciones avanzan en el mismo cuadro, con un tope de cuadros por segundo.
+    Cada efecto es una función paso(dt) que devuelve False cuando terminó.
+    En calidad "automatica" mide el retraso real de cada cuadro y baja de nivel
+    (menos partículas y menos FPS) si la interfaz no alcanza; sube otra vez cuando se recupera.
+    Sin efectos ("ninguna") solo se elige a mano."""
+    
+    CUADROS_PARA_BAJAR = 30     # Cuadros lentos seguidos (en promedio) antes de bajar de nivel
+    CUADROS_PARA_SUBIR = 300    # Cuadros holgados antes de volver a subir
+    
+    def __init__(self, root, calidad="automatica"):
+        self.root = root
+        self._efectos = {}        # paso -> decorativo
+        self._after = None
+        self._ultimo = None
+        self.pausado = False
+        self.establecer_calidad(calidad)
+    
+    def establecer_calidad(self, calidad):
+        """Fija la calidad: "automatica" o uno de NIVELES_EFECTOS."""
+        self.calidad = calidad if calidad in NIVELES_EFECTOS or calidad == "automatica" else "automatica"
+        self._cambiar_nivel("completa" if self.calidad == "automatica" else self.calidad)
+    
+    def _cambiar_nivel(self, nivel):
+        self.nivel = nivel
+        self.intervalo = 1.0 / NIVELES_EFECTOS[nivel]["fps"]
+        self._retraso_medio = 0.0
+        self._cuadros_en_nivel = 0
+    
+    def parametros(self):
+        """Partículas y FPS del nivel vigente."""
+        return NIVELES_EFECTOS[self.nivel]
+    
+    def _adaptar(self, dt):
+        """Promedio móvil del retraso respecto al cuadro esperado; cambia de nivel si hace falta."""
+        retraso = max(0.0, dt - self.intervalo) / self.intervalo
+        self._retraso_medio = 0.9 * self._retraso_medio + 0.1 * retraso
+        self._cuadros_en_nivel += 1
+        posicion = ORDEN_NIVELES_EFECTOS.index(self.nivel)
+        if (self._retraso_medio > 0.5 and self._cuadros_en_nivel >= self.CUADROS_PARA_BAJAR
+                and posicion < len(ORDEN_NIVELES_EFECTOS) - 1):
+            self._cambiar_nivel(ORDEN_NIVELES_EFECTOS[posicion + 1])
+        elif (self._retraso_medio < 0.1 and self._cuadros_en_nivel >= self.CUADROS_PARA_SUBIR
+                and posicion > 0):
+            self._cambiar_nivel(ORDEN_NIVELES_EFECTOS[posicion - 1])
+    
+    def agregar(self, paso, decorativo=False):
+        """Registra un efecto. Los decorativos (brillos) se detienen mientras el reloj está en pausa."""
+        self._efectos[paso] = decorativo
+        self._programar()
+    
+    def quitar(self, paso):
+        self._efectos.pop(paso, None)
+    
+    def pausar(self):
+        """Detiene los efectos decorativos (p. ej. con la app minimizada o en la bandeja)."""
+        self.pausado = True
+    
+    def reanudar(self):
+        self.pausado = False
+        self._programar()
+    
+    def _hay_trabajo(self):
+        return any(not decorativo or not self.pausado for decorativo in self._efectos.values())
+    
+    def _programar(self, demora=0.0):
+        if self._after is None and self._hay_trabajo():
+            if demora == 0.0:
+                self._ultimo = None  # Tras una pausa no se acumula el tiempo detenido
+            try:
+                self._after = self.root.after(max(1, int(demora * 1000)), self._cuadro)
+            except tk.TclError:
+                pass  # La ventana ya se destruyó
+    
+    def _cuadro(self):
+        self._after = None
+        inicio = time.perf_counter()
+        if self._ultimo is None:
+            dt = self.intervalo
+        else:
+            dt = inicio - self._ultimo
+            if self.calidad == "automatica":
+                self._adaptar(dt)
+        self._ultimo = inicio
+        for paso, decorativo in list(self._efectos.items()):
+            if decorativo and self.pausado:
+                continue
+            try:
+                sigue = paso(dt)
+            except tk.TclError:
+                sigue = False  # Ventana destruida
+            if not sigue:
+                self._efectos.pop(paso, None)
+        # Tope de FPS: el próximo cuadro descuenta lo que tardó este
+        duracion = time.perf_counter() - inicio
+        self._programar(max(self.intervalo - duracion, 0.001))
+
+
+class TarjetaNotificacion:
+    """Ventana de notificación reutilizable: se construye una vez y luego solo se
+    cambian textos y colores. Al cerrarse se oculta (withdraw) y vuelve al pool."""
+    
+    ANCHO = 420
+    ALTO = 260
+    MAX_PARTICULAS = NIVELES_EFECTOS["completa"]["max_particulas"]
+    VIDA_PARTICULA = 5.0       # segundos
+    NACIMIENTOS_POR_SEGUNDO = 6
+    VELOCIDAD_MAXIMA = 40      # píxeles por segundo
+    DURACION_ENTRADA = 0.3     # segundos del fundido de entrada
+    
+    def __init__(self, parent, al_cerrar, reloj):
+        self.al_cerrar = al_cerrar
+        self.reloj = reloj
+        self.al_posponer = None
+        self.tema = None
+        self.visible = False
+        self._after_cierre = None
+        self._alpha = 0.0
+        self._particulas = []      # [item, vx, vy, vida] de las partículas en movimiento
+        self._particulas_libres = []
+        
+        self.ventana = tk.Toplevel(parent)
+        self.ventana.withdraw()
+        self.ventana.title("✨ Recordatorio")
+        self.ventana.overrideredirect(True)  # Sin bordes
+        self.ventana.attributes("-topmost", True)
+        
+        self.frame_principal = tk.Frame(self.ventana, padx=20, pady=15, relief=tk.RAISED, bd=5)
+        self.frame_principal.pack(fill=tk.BOTH, expand=True)
+        
+        # Canvas de brillos al fondo: con place cubre todo el marco sin quitarle espacio a los
+        # textos y botones empaquetados después (Canvas.lower() es para ítems, no para el widget)
+        self.canvas = tk.Canvas(self.frame_principal, highlightthickness=0)
+        self.canvas.place(x=0, y=0, relwidth=1, relheight=1)
+        self.frame_principal.tk.call('lower', self.canvas._w)
+        # Partículas creadas una sola vez y recicladas: ocultas cuando no están en uso
+        for _ in range(self.MAX_PARTICULAS):
+            self._particulas_libres.append(self.canvas.create_oval(
+                0, 0, 0, 0, fill="#FFD700", outline="#FFA500", width=1, state="hidden"
+            ))
+        
+        self.hey_label = tk.Label(self.frame_principal, font=("Arial", 16, "bold"), wraplength=380)
+        self.hey_label.pack(pady=(0, 10))
+        self.titulo_label = tk.Label(self.frame_principal, font=("Arial", 14, "bold"), wraplength=380)
+        self.titulo_label.pack(pady=(0, 8))
+        self.mensaje_label = tk.Label(self.frame_principal, font=("Arial", 11), wraplength=350, justify=tk.LEFT)
+        self.mensaje_label.pack(pady=(0, 12))
+        
+        self.frame_botones = tk.Frame(self.frame_principal)
+        self.frame_botones.pack()
+        estilo_boton = dict(fg="white", font=("Arial", 10, "bold"), pady=5, cursor="hand2", relief=tk.RAISED, bd=3)
+        self.btn_cerrar = tk.Button(self.frame_botones, command=self.ocultar, padx=20, **estilo_boton)
+        self.btn_cerrar.pack(side=tk.LEFT, padx=5)
+        self.btn_posponer = tk.Button(self.frame_botones, command=self._posponer, padx=10, **estilo_boton)
+    
+    def _aplicar_tema(self, tema):
+        """Cambia los colores solo si el tema es distinto al del último uso."""
+        if tema == self.tema:
+            return
+        self.tema = tema
+        t = TEMAS.get(tema, TEMAS["Kawaii"])
+        self.ventana.configure(bg=t["notif_bg"])
+        for widget in (self.frame_principal, self.canvas, self.frame_botones):
+            widget.configure(bg=t["notif_frame"])
+        self.hey_label.configure(text=t.get("notif_hey", "¡HEY HEY, TIENES UN PENDIENTE!"),
+                                 bg=t["notif_frame"], fg=t["notif_fg_hey"])
+        for label in (self.titulo_label, self.mensaje_label):
+            label.configure(bg=t["notif_frame"], fg=t["notif_fg_text"])
+        self.btn_cerrar.configure(text=t.get("notif_btn_cerrar", "💖 Cerrar"), bg=t["notif_btn"])
+        self.btn_posponer.configure(bg=t["notif_btn"])
+    
+    def mostrar(self, titulo, mensaje, tema, al_posponer, posicion, texto_posponer):
+        """Muestra la tarjeta en el hueco 'posicion' de la pila (0 = arriba)."""
+        self._aplicar_tema(tema)
+        self.titulo_label.configure(text=titulo)
+        self.mensaje_label.configure(text=mensaje)
+        self.al_posponer = al_posponer
+        if al_posponer:
+            self.btn_posponer.configure(text=texto_posponer)
+            self.btn_posponer.pack(side=tk.LEFT, padx=5)
+        else:
+            self.btn_posponer.pack_forget()
         
-        # Filtrar según tipo de tarea
-        tareas_a_notificar = []
-        for tarea in todas_tareas:
-            tarea_id, titulo, descripcion, fecha_recordatorio, notif_sistema, notif_correo, importancia, es_permanente = tarea
-            
-            if es_permanente:
-                # Tarea permanente: verificar que la fecha de inicio ya pasó Y que la hora coincide
-                try:
-                    fecha_obj = datetime.strptime(fecha_recordatorio, "%Y-%m-%d %H:%M:%S")
-                    fecha_inicio = fecha_obj.date()  # Solo la fecha (sin hora)
-                    fecha_actual = ahora.date()
-                    hora_recordatorio = fecha_obj.strftime("%H:%M")
-                    
-                    # Verificar que la fecha de inicio ya pasó (o es hoy) Y que la hora coincide
-                    if fecha_inicio <= fecha_actual and hora_recordatorio == hora_actual:
-                        tareas_a_notificar.append(tarea)
-                except:
-                    # Si el formato no es el esperado, intentar solo hora (compatibilidad)
-                    try:
-                        if fecha_recordatorio.startswith(hora_actual):
-                            tareas_a_notificar.append(tarea)
-                    except:
-                        pass
-            else:
-                # Tarea normal: verificar fecha y hora específica
-                if fecha_recordatorio <= ahora_str:
-                    tareas_a_notificar.append(tarea)
+        self.colocar(posicion)
+        self.visible = True
+        self.ventana.deiconify()
+        self.ventana.lift()
+        self.ventana.focus_force()
         
-        return tareas_a_notificar
+        # Cerrar automáticamente después de 10 segundos
+        self._after_cierre = self.ventana.after(10000, self.ocultar)
+        self.animar_brillos()
+        self.animar_entrada()
+    
+    def colocar(self, posicion):
+        x = self.ventana.winfo_screenwidth() - self.ANCHO - 20
+        y = 20 + posicion * (self.ALTO + 10)
+        self.ventana.geometry(f"{self.ANCHO}x{self.ALTO}+{x}+{y}")
+    
+    def _posponer(self):
+        if self.al_posponer:
+            self.al_posponer()
+        self.ocultar()
+    
+    def ocultar(self):
+        """Oculta la tarjeta, cancela sus animaciones y suelta las referencias del aviso."""
+        if not self.visible:
+            return
+        self.visible = False
+        if self._after_cierre:
+            self.ventana.after_cancel(self._after_cierre)
+        self._after_cierre = None
+        self.reloj.quitar(self._animar_entrada)
+        self.reloj.quitar(self._animar_particulas)
+        for p in self._particulas:
+            self.canvas.itemconfigure(p[0], state="hidden")
+            self._particulas_libres.append(p[0])
+        self._particulas.clear()
+        self.al_posponer = None
+        self.ventana.withdraw()
+        self.al_cerrar(self)
+    
+    def destruir(self):
+        self.visible = False
+        self.al_posponer = None
+        self.reloj.quitar(self._animar_entrada)
+        self.reloj.quitar(self._animar_particulas)
+        self.ventana.destroy()
+    
+    def animar_brillos(self):
+        """Crea partículas de brillo animadas (las mueve el reloj compartido)"""
+        parametros = self.reloj.parametros()
+        if not parametros["max_particulas"]:
+            return
+        # Con el reloj en pausa (app en la bandeja) no se moverían: quedarían puntos congelados.
+        # Sin las iniciales, los brillos van naciendo solos cuando el reloj se reanuda
+        if not self.reloj.pausado:
+            for _ in range(parametros["particulas_iniciales"]):
+                self._nueva_particula()
+        self.reloj.agregar(self._animar_particulas, decorativo=True)
+    
+    def _nueva_particula(self):
+        """Reutiliza un óvalo libre en una posición y dirección al azar."""
+        if not self._particulas_libres:
+            return
+        item = self._particulas_libres.pop()
+        x = random.randint(0, self.ANCHO)
+        y = random.randint(0, self.ALTO)
+        size = random.randint(3, 8)
+        self.canvas.coords(item, x, y, x + size, y + size)
+        self.canvas.itemconfigure(item, state="normal")
+        self._particulas.append([
+            item,
+            random.uniform(-self.VELOCIDAD_MAXIMA, self.VELOCIDAD_MAXIMA),
+            random.uniform(-self.VELOCIDAD_MAXIMA, self.VELOCIDAD_MAXIMA),
+            self.VIDA_PARTICULA,
+        ])
+    
+    def _animar_particulas(self, dt):
+        if not self.visible:
+            return False
+        max_particulas = self.reloj.parametros()["max_particulas"]
+        vivas = []
+        for p in self._particulas:
+            p[3] -= dt
+            if p[3] <= 0 or len(vivas) >= max_particulas:
+                self.canvas.itemconfigure(p[0], state="hidden")
+                self._particulas_libres.append(p[0])
+            else:
+                self.canvas.move(p[0], p[1] * dt, p[2] * dt)
+                vivas.append(p)
+        self._particulas = vivas
+        
+        # Crear nuevas partículas ocasionalmente (sin pasar el tope del nivel vigente)
+        if len(vivas) < max_particulas and random.random() < self.NACIMIENTOS_POR_SEGUNDO * dt:
+            self._nueva_particula()
+        return bool(max_particulas or vivas)
+    
+    def animar_entrada(self):
+        """Anima la entrada de la notificación"""
+        if self.reloj.nivel == "ninguna":
+            self._alpha = 1.0
+            self.ventana.attributes('-alpha', 1.0)
+            return
+        self._alpha = 0.0
+        self.ventana.attributes('-alpha', 0.0)
+        self.reloj.agregar(self._animar_entrada)
+    
+    def _animar_entrada(self, dt):
+        if not self.visible:
+            return False
+        self._alpha = min(1.0, self._alpha + dt / self.DURACION_ENTRADA)
+        self.ventana.attributes('-alpha', self._alpha)
+        return self._alpha < 1.0
 
 
 class NotificacionKawaii:
-    """Crea notificaciones personalizadas con efectos de brillo"""
+    """Crea notificaciones personalizadas con efectos de brillo.
+    Reutiliza un pool de ventanas, muestra como máximo MAX_VISIBLES a la vez (apiladas)
+    y deja el resto en espera; los avisos que llegan juntos se agrupan en una sola tarjeta."""
+    
+    MAX_VISIBLES = 3
+    MAX_EN_ESPERA = 10        # Más allá de esto, los avisos en espera se agrupan en un resumen
+    MAX_TITULOS_RESUMEN = 5
     
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, reloj=None):
         self.parent = parent
-        self.ventanas_notificacion = []
+        self.reloj = reloj or RelojAnimacion(parent)
+        self._libres = []       # Tarjetas ocultas listas para reutilizar
+        self._visibles = []     # Tarjetas en pantalla, en orden de la pila
+        self._en_espera = []    # Grupos de avisos [(titulo, mensaje, al_posponer), ...] y su tema
     
-    def crear_notificacion(self, titulo, mensaje, tema="Kawaii"):
-        """Crea una ventana de notificación con efectos de brillo (colores según tema)."""
-        t = TEMAS.get(tema, TEMAS["Kawaii"])
-        ventana = tk.Toplevel(self.parent if self.parent else None)
-        ventana.title("✨ Recordatorio")
-        ventana.geometry("420x260")
-        ventana.configure(bg=t["notif_bg"])
-        ventana.overrideredirect(True)  # Sin bordes
-        
-        ventana.attributes("-topmost", True)
-        ventana.lift()
-        ventana.focus_force()
-        
-        ventana.update_idletasks()
-        width = 420
-        height = 260
-        x = ventana.winfo_screenwidth() - width - 20
-        y = 20
-        ventana.geometry(f"{width}x{height}+{x}+{y}")
-        
-        frame_principal = tk.Frame(
-            ventana,
-            bg=t["notif_frame"],
-            padx=20,
-            pady=15,
-            relief=tk.RAISED,
-            bd=5
-        )
-        frame_principal.pack(fill=tk.BOTH, expand=True)
-        
-        hey_label = tk.Label(
-            frame_principal,
-            text=t.get("notif_hey", "¡HEY HEY, TIENES UN PENDIENTE!"),
-            font=("Arial", 16, "bold"),
-            bg=t["notif_frame"],
-            fg=t["notif_fg_hey"],
-            wraplength=380
-        )
-        hey_label.pack(pady=(0, 10))
-        
-        titulo_label = tk.Label(
-            frame_principal,
-            text=titulo,
-            font=("Arial", 14, "bold"),
-            bg=t["notif_frame"],
-            fg=t["notif_fg_text"],
-            wraplength=380
-        )
-        titulo_label.pack(pady=(0, 8))
-        
-        mensaje_label = tk.Label(
-            frame_principal,
-            text=mensaje,
-            font=("Arial", 11),
-            bg=t["notif_frame"],
-            fg=t["notif_fg_text"],
-            wraplength=350,
-            justify=tk.LEFT
+    def crear_notificacion(self, titulo, mensaje, tema="Kawaii", al_posponer=None):
+        """Muestra una notificación con efectos de brillo (colores según tema).
+        Si se pasa al_posponer, agrega un botón para volver a avisar en unos minutos."""
+        self.notificar_grupo([(titulo, mensaje, al_posponer)], tema)
+    
+    def notificar_grupo(self, avisos, tema="Kawaii"):
+        """Muestra varios avisos del mismo momento en una sola tarjeta de resumen
+        (o en una tarjeta normal si es solo uno)."""
+        if not avisos:
+            return
+        if len(self._visibles) < self.MAX_VISIBLES:
+            self._mostrar(list(avisos), tema)
+        elif len(self._en_espera) < self.MAX_EN_ESPERA:
+            self._en_espera.append((list(avisos), tema))
+        else:
+            # Cola llena: se suman al último grupo en espera
+            self._en_espera[-1][0].extend(avisos)
+    
+    def _mostrar(self, avisos, tema):
+        tarjeta = self._libres.pop() if self._libres else TarjetaNotificacion(self.parent, self._al_cerrar, self.reloj)
+        if len(avisos) == 1:
+            titulo, mensaje, al_posponer = avisos[0]
+            texto_posponer = f"⏰ Posponer {MINUTOS_POSPONER} min"
+        else:
+            titulo, mensaje, al_posponer = resumir_avisos(avisos, self.MAX_TITULOS_RESUMEN)
+            texto_posponer = f"⏰ Posponer todas {MINUTOS_POSPONER} min"
+        self._visibles.append(tarjeta)
+        tarjeta.mostrar(titulo, mensaje, tema, al_posponer, len(self._visibles) - 1, texto_posponer)
+    
+    def _al_cerrar(self, tarjeta):
+        """Devuelve la tarjeta al pool, reacomoda la pila y muestra el siguiente en espera."""
+        if tarjeta in self._visibles:
+            self._visibles.remove(tarjeta)
+        self._libres.append(tarjeta)
+        for posicion, visible in enumerate(self._visibles):
+            visible.colocar(posicion)
+        if self._en_espera:
+            avisos, tema = self._en_espera.pop(0)
+            self._mostrar(avisos, tema)
+    
+    def cerrar_todas(self):
+        """Destruye todas las ventanas del pool (al salir de la aplicación)."""
+        self._en_espera.clear()
+        for tarjeta in self._visibles + self._libres:
+            try:
+                tarjeta.destruir()
+            except tk.TclError:
+                pass
+        self._visibles.clear()
+        self._libres.clear()
+
+
+class BackendNotificacionKawaii:
+    """Ventanas propias con brillos (necesita el hilo de Tk)."""
+    
+    requiere_tk = True
+    
+    def __init__(self, parent=None, reloj=None):
+        self.notificador_kawaii = NotificacionKawaii(parent, reloj)
+    
+    def notificar(self, avisos, tema):
+        self.notificador_kawaii.notificar_grupo(avisos, tema=tema)
+    
+    def cerrar(self):
+        self.notificador_kawaii.cerrar_todas()
+
+
+class BackendNotificacionNativa:
+    """Notificaciones del sistema operativo con plyer. No usa Tk, así que se puede
+    llamar desde el hilo de recordatorios aunque la ventana esté oculta.
+    Las notificaciones nativas no tienen botón 'Posponer'."""
+    
+    requiere_tk = False
+    MAX_MENSAJE = 256  # Windows corta los textos más largos
+    
+    def __init__(self, parent=None, reloj=None):
+        plyer = importar_diferido("plyer")
+        if plyer is None:
+            raise RuntimeError("plyer no está instalado")
+        self.notificacion = plyer.notification
+    
+    def notificar(self, avisos, tema):
+        if len(avisos) == 1:
+            titulo, mensaje, _ = avisos[0]
+        else:
+            titulo, mensaje, _ = resumir_avisos(avisos)
+        self.notificacion.notify(
+            title=titulo[:64],
+            message=(mensaje or titulo)[:self.MAX_MENSAJE],
+            app_name="Agenda Virtual",
+            timeout=10
         )
-        mensaje_label.pack(pady=(0, 12))
+    
+    def cerrar(self):
+        pass
+
+
+class BackendNotificacionPrueba:
+    """No muestra nada: guarda los avisos recibidos (para pruebas y ejecuciones sin pantalla)."""
+    
+    requiere_tk = False
+    
+    def __init__(self, parent=None, reloj=None):
+        self.enviados = []
+    
+    def notificar(self, avisos, tema):
+        self.enviados.append([(titulo, mensaje) for titulo, mensaje, _ in avisos])
+    
+    def cerrar(self):
+        self.enviados.clear()
+
+
+# Backends disponibles (valor de "notificaciones" en config_tema.json)
+BACKENDS_NOTIFICACION = {
+    "kawaii": BackendNotificacionKawaii,
+    "nativa": BackendNotificacionNativa,
+    "prueba": BackendNotificacionPrueba,
+}
+
+
+class Notificador:
+    """Maneja las notificaciones del sistema.
+    Delega en un backend (kawaii, nativa o prueba). Si el backend elegido falla se usa
+    la ventana kawaii como respaldo. ejecutar_en_tk encola una función en el hilo de Tk
+    (por defecto la llama directamente)."""
+    
+    def __init__(self, parent=None, obtener_tema=None, reloj=None, backend="kawaii", ejecutar_en_tk=None):
+        self.parent = parent
+        self.reloj = reloj
+        self.obtener_tema = obtener_tema or (lambda: "Kawaii")
+        self.ejecutar_en_tk = ejecutar_en_tk or (lambda funcion, *args: funcion(*args))
+        self._respaldo = None
+        try:
+            self.backend = BACKENDS_NOTIFICACION.get(backend, BackendNotificacionKawaii)(parent, reloj)
+        except Exception as e:
+            print(f"Error al iniciar notificaciones '{backend}', se usan las ventanas kawaii: {e}")
+            self.backend = self._backend_respaldo()
+    
+    def _backend_respaldo(self):
+        if self._respaldo is None:
+            self._respaldo = BackendNotificacionKawaii(self.parent, self.reloj)
+        return self._respaldo
+    
+    def notificar_sistema(self, titulo, mensaje, al_posponer=None):
+        """Envía una notificación personalizada con brillos.
+        al_posponer: función opcional para el botón 'Posponer'."""
+        self.notificar_varios([(titulo, mensaje, al_posponer)])
+    
+    def notificar_varios(self, avisos):
+        """Envía juntos varios avisos [(titulo, mensaje, al_posponer), ...] que vencieron a la vez.
+        Se puede llamar desde cualquier hilo."""
+        tema = self.obtener_tema() if self.obtener_tema else "Kawaii"
+        if self.backend.requiere_tk:
+            self.ejecutar_en_tk(self._notificar_en_tk, self.backend, avisos, tema)
+            return
+        try:
+            self.backend.notificar(avisos, tema)
+        except Exception as e:
+            print(f"Error al enviar notificación nativa, se muestra en la app: {e}")
+            self.ejecutar_en_tk(self._notificar_en_tk, self._backend_respaldo(), avisos, tema)
+    
+    def _notificar_en_tk(self, backend, avisos, tema):
+        try:
+            backend.notificar(avisos, tema)
+        except Exception as e:
+            print(f"Error al enviar notificación: {e}")
+    
+    def cerrar(self):
+        for backend in (self.backend, self._respaldo):
+            if backend is not None:
+                backend.cerrar()
+
+
+class ColaInterfaz:
+    """Pasa trabajo de los hilos secundarios (recordatorios, bandeja) al hilo de Tk.
+    Tkinter no es seguro entre hilos: los hilos solo encolan funciones y un bucle con
+    root.after las ejecuta por lotes en el hilo principal."""
+    
+    INTERVALO_MS = 50     # Cada cuánto se vacía la cola
+    MAX_POR_CICLO = 20    # Máximo de tareas por ciclo, para no bloquear la interfaz
+    CAPACIDAD = 500
+    
+    def __init__(self, root, capacidad=CAPACIDAD):
+        self.root = root
+        self._cola = queue.Queue(maxsize=capacidad)
+        self._lock = threading.Lock()
+        self._encoladas = 0
+        self._descartadas = 0
+        self._despachadas = 0
+        self._profundidad_max = 0
+        self._latencia_total = 0.0
+        self._latencia_max = 0.0
+        self._activa = False
+    
+    def iniciar(self):
+        self._activa = True
+        self.root.after(self.INTERVALO_MS, self._bombear)
+    
+    def detener(self):
+        self._activa = False
+    
+    def enviar(self, funcion, *args, espera=1.0):
+        """Encola funcion(*args) para ejecutarla en el hilo de Tk.
+        Si la cola está llena espera hasta 'espera' segundos; devuelve False si se descartó."""
+        try:
+            self._cola.put((time.perf_counter(), funcion, args), timeout=espera)
+        except queue.Full:
+            with self._lock:
+                self._descartadas += 1
+            return False
+        with self._lock:
+            self._encoladas += 1
+            self._profundidad_max = max(self._profundidad_max, self._cola.qsize())
+        return True
+    
+    def _bombear(self):
+        for _ in range(self.MAX_POR_CICLO):
+            try:
+                encolada, funcion, args = self._cola.get_nowait()
+            except queue.Empty:
+                break
+            latencia = time.perf_counter() - encolada
+            with self._lock:
+                self._despachadas += 1
+                self._latencia_total += latencia
+                self._latencia_max = max(self._latencia_max, latencia)
+            try:
+                funcion(*args)
+            except Exception as e:
+                print(f"Error al ejecutar tarea en la interfaz: {e}")
+        if self._activa:
+            try:
+                self.root.after(self.INTERVALO_MS, self._bombear)
+            except tk.TclError:
+                pass  # La ventana ya se destruyó
+    
+    def metricas(self):
+        """Profundidad de la cola y latencia de despacho (ms) acumuladas."""
+        with self._lock:
+            return {
+                "profundidad": self._cola.qsize(),
+                "profundidad_max": self._profundidad_max,
+                "encoladas": self._encoladas,
+                "descartadas": self._descartadas,
+                "despachadas": self._despachadas,
+                "latencia_media_ms": (self._latencia_total / self._despachadas * 1000) if self._despachadas else 0.0,
+                "latencia_max_ms": self._latencia_max * 1000,
+            }
+
+
+class PlanificadorRecordatorios:
+    """Duerme hasta el próximo recordatorio en lugar de revisar la base cada minuto.
+    Mantiene un montículo (heap) con la próxima notificación de cada tarea; cuando el almacén
+    avisa que cambió un recordatorio, solo se vuelve a leer esa tarea (desde memoria)."""
+    
+    # Tope de espera para recuperarse de suspensiones o cambios de hora del sistema
+    ESPERA_MAXIMA = 300
+    # Si al_vencer falla (p. ej. base bloqueada), los vencidos se reintentan tras estos segundos
+    ESPERA_REINTENTO = 30
+    
+    def __init__(self, almacen, al_vencer):
+        self.almacen = almacen
+        self.al_vencer = al_vencer
+        self._heap = []          # (segundos UTC, tarea_id); entradas obsoletas se descartan al salir
+        self._proximas = {}      # tarea_id -> segundos UTC vigentes
+        self._cambiadas = set()  # ids a releer desde el almacén
+        self._recargar = False   # Rearmar todo el heap (tras AlmacenTareas.cargar)
+        self._condicion = threading.Condition()
+        self._activo = False
+        self._hilo = None
+    
+    def iniciar(self):
+        """Carga los recordatorios desde el almacén e inicia el hilo."""
+        self._activo = True
+        self._hilo = threading.Thread(target=self._ejecutar, daemon=True)
+        self._hilo.start()
+    
+    def detener(self):
+        with self._condicion:
+            self._activo = False
+            self._condicion.notify()
+    
+    def recargar(self):
+        """El almacén se volvió a cargar entero: el heap se rearma en el hilo del planificador."""
+        with self._condicion:
+            self._recargar = True
+            self._condicion.notify()
+    
+    def marcar_cambios(self, tarea_ids, solo_recordatorio=False):
+        """Suscriptor de AlmacenTareas: las tareas cambiaron (se releen en el hilo del planificador)."""
+        with self._condicion:
+            self._cambiadas.update(tarea_ids)
+            self._condicion.notify()
+    
+    def _programar(self, tarea_id, proxima):
+        if proxima is None:
+            self._proximas.pop(tarea_id, None)
+            return
+        self._proximas[tarea_id] = proxima
+        heapq.heappush(self._heap, (proxima, tarea_id))
+    
+    def _reconstruir(self):
+        self._heap = []
+        self._proximas = {}
+        for tarea_id, proxima in self.almacen.recordatorios_programados():
+            self._programar(tarea_id, proxima)
+    
+    def _releer_cambiadas(self, ids):
+        for tarea_id in ids:
+            self._programar(tarea_id, self.almacen.proxima_notificacion(tarea_id))
+    
+    def _limpiar_cima(self):
+        while self._heap and self._proximas.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+    
+    def _ejecutar(self):
+        try:
+            self._reconstruir()
+        except Exception as e:
+            print(f"Error al cargar recordatorios: {e}")
+        while True:
+            with self._condicion:
+                if not self._activo:
+                    return
+                cambiadas, self._cambiadas = self._cambiadas, set()
+                recargar, self._recargar = self._recargar, False
+                if not cambiadas and not recargar:
+                    self._limpiar_cima()
+                    espera = self.ESPERA_MAXIMA
+                    if self._heap:
+                        espera = min(espera, self._heap[0][0] - time.time())
+                    if espera > 0:
+                        self._condicion.wait(espera)
+                        continue
+            try:
+                if recargar:
+                    self._reconstruir()
+                    continue
+                if cambiadas:
+                    self._releer_cambiadas(cambiadas)
+                    continue
+                self._disparar_vencidos()
+            except Exception as e:
+                print(f"Error en el planificador de recordatorios: {e}")
+    
+    def _disparar_vencidos(self):
+        ahora = time.time()
+        vencidos = []
+        while self._heap and self._heap[0][0] <= ahora:
+            momento, tarea_id = heapq.heappop(self._heap)
+            if self._proximas.get(tarea_id) == momento:
+                del self._proximas[tarea_id]
+                vencidos.append(tarea_id)
+        # al_vencer registra la entrega; el almacén avisa el cambio y aquí se relee la siguiente
+        if vencidos:
+            try:
+                self.al_vencer()
+            except Exception:
+                # Siguen vencidos en el almacén: sin volver a programarlos no sonarían nunca más
+                for tarea_id in vencidos:
+                    if tarea_id not in self._proximas:
+                        self._programar(tarea_id, int(ahora) + self.ESPERA_REINTENTO)
+                raise
+
+
+def subsecuencia_creciente(elementos, posicion):
+    """Elementos que forman la subsecuencia más larga con posicion[elemento] creciente.
+    Sirve para mover el mínimo de filas al reordenar una lista."""
+    finales = []   # finales[k] = posición final de la mejor subsecuencia de largo k+1
+    indices = []   # índice (en elementos) de ese final
+    previo = [None] * len(elementos)
+    for i, elemento in enumerate(elementos):
+        valor = posicion[elemento]
+        k = bisect.bisect_left(finales, valor)
+        if k > 0:
+            previo[i] = indices[k - 1]
+        if k == len(finales):
+            finales.append(valor)
+            indices.append(i)
+        else:
+            finales[k] = valor
+            indices[k] = i
+    resultado = set()
+    i = indices[-1] if indices else None
+    while i is not None:
+        resultado.add(elementos[i])
+        i = previo[i]
+    return resultado
+
+
+class RegistroTema:
+    """Widgets y los roles del tema que usan (opción -> clave de TEMAS), registrados al crearlos.
+    Cambiar de tema es aplicar una lista ya calculada de configure, sin recorrer el árbol de widgets."""
+    
+    def __init__(self):
+        self._widgets = []   # (widget, roles)
+        self._lotes = {}     # nombre del tema -> [(widget.configure, opciones)]
+    
+    @staticmethod
+    def _opciones(t, roles):
+        return {
+            opcion: t.get(*clave) if isinstance(clave, tuple) else t[clave]
+            for opcion, clave in roles.items()
+        }
+    
+    def registrar(self, widget, t, **roles):
+        """Registra el widget, le aplica los valores del tema t y lo devuelve."""
+        widget.configure(**self._opciones(t, roles))
+        self._widgets.append((widget, roles))
+        self._lotes.clear()
+        widget.bind("<Destroy>", lambda e, w=widget: self._quitar(w) if e.widget is w else None, add="+")
+        return widget
+    
+    def _quitar(self, widget):
+        self._widgets = [(w, roles) for w, roles in self._widgets if w is not widget]
+        self._lotes.clear()
+    
+    def aplicar(self, tema):
+        """Aplica el tema a todos los widgets registrados."""
+        lote = self._lotes.get(tema)
+        if lote is None:
+            t = TEMAS.get(tema, TEMAS["Kawaii"])
+            lote = self._lotes[tema] = [(w.configure, self._opciones(t, roles)) for w, roles in self._widgets]
+        for configurar, opciones in lote:
+            try:
+                configurar(**opciones)
+            except tk.TclError:
+                pass
+
+
+class GestorDisposicion:
+    """Junta las ráfagas de <Configure> (arrastrar el borde de la ventana genera decenas)
+    en una sola pasada de disposición por cuadro. Cada widget registrado recalcula solo si
+    su medida cambió de tramo (p. ej. de 8 en 8 px de ancho)."""
+    
+    INTERVALO_MS = 16   # ~ un cuadro a 60 Hz
+    PASO_ANCHO = 8
+    
+    def __init__(self, root):
+        self.root = root
+        self._registros = {}   # widget -> [funcion, medida, paso, último tramo]
+        self._pendientes = {}  # widget -> última medida recibida
+        self._after = None
+    
+    def registrar(self, widget, funcion, medida=lambda e: e.width, paso=PASO_ANCHO):
+        """Llama funcion(valor) cuando cambia medida(evento) del widget, a lo más una vez por cuadro."""
+        self._registros[widget] = [funcion, medida, paso, None]
+        widget.bind("<Configure>", lambda e: self._al_configurar(widget, e), add="+")
+    
+    def _al_configurar(self, widget, event):
+        if event.widget is not widget:
+            return
+        self._pendientes[widget] = self._registros[widget][1](event)
+        if self._after is None:
+            self._after = self.root.after(self.INTERVALO_MS, self._disponer)
+    
+    def _disponer(self):
+        self._after = None
+        pendientes, self._pendientes = self._pendientes, {}
+        for widget, valor in pendientes.items():
+            registro = self._registros[widget]
+            tramo = valor // registro[2]
+            if tramo == registro[3]:
+                continue
+            registro[3] = tramo
+            try:
+                registro[0](tramo * registro[2])
+            except tk.TclError:
+                pass
+    
+    def invalidar(self, widget):
+        """Obliga a recalcular el widget en su próximo <Configure>."""
+        if widget in self._registros:
+            self._registros[widget][3] = None
+
+
+class DialogoEditarTarea:
+    """Ventana de edición de tareas. Se construye una sola vez (el DateEntry de tkcalendar
+    es caro de crear) y se reutiliza: al cerrar se oculta y al abrir se carga otra tarea."""
+    
+    def __init__(self, app):
+        self.app = app
+        self.tarea_id = None
+        con_tema = app._con_tema
+        
+        self.ventana = con_tema(tk.Toplevel(app.root), bg="bg_main")
+        self.ventana.withdraw()
+        self.ventana.title("✏️ Editar Tarea")
+        self.ventana.geometry("600x650")
+        self.ventana.minsize(550, 600)
+        self.ventana.transient(app.root)
+        self.ventana.protocol("WM_DELETE_WINDOW", self.cerrar)
+        self.ventana.bind("<Escape>", lambda e: self.cerrar())
+        
+        frame_editar = con_tema(tk.Frame(self.ventana, padx=20, pady=15), bg="bg_main")
+        frame_editar.pack(fill=tk.BOTH, expand=True)
+        
+        # Título
+        con_tema(tk.Label(
+            frame_editar,
+            text="✏️ Editar Tarea",
+            font=("Arial", 18, "bold")
+        ), bg="bg_main", fg="fg_title").pack(pady=(0, 15))
+        
+        # Título de la tarea
+        con_tema(tk.Label(frame_editar, text="Título:", font=("Arial", 11, "bold")), bg="bg_main", fg="fg_text").pack(anchor=tk.W, pady=(0, 5))
+        self.entry_titulo = tk.Entry(frame_editar, font=("Arial", 11), width=50)
+        self.entry_titulo.pack(fill=tk.X, pady=(0, 12))
+        
+        # Descripción
+        con_tema(tk.Label(frame_editar, text="Descripción:", font=("Arial", 11, "bold")), bg="bg_main", fg="fg_text").pack(anchor=tk.W, pady=(0, 5))
+        self.text_descripcion = tk.Text(frame_editar, font=("Arial", 10), height=4, width=50)
+        self.text_descripcion.pack(fill=tk.X, pady=(0, 12))
+        
+        # Frame para recordatorio
+        frame_recordatorio = con_tema(tk.Frame(frame_editar), bg="bg_main")
+        frame_recordatorio.pack(fill=tk.X, pady=(0, 12))
+        
+        con_tema(tk.Label(frame_recordatorio, text="Fecha de recordatorio:", font=("Arial", 10)), bg="bg_main", fg="fg_text").pack(side=tk.LEFT, padx=(0, 10))
+        
+        self.calendario = con_tema(importar_diferido("tkcalendar").DateEntry(
+            frame_recordatorio,
+            width=12,
+            borderwidth=2,
+            date_pattern='yyyy-mm-dd',
+            font=("Arial", 10)
+        ), background="calendar_bg", foreground="calendar_fg")
+        self.calendario.pack(side=tk.LEFT, padx=(0, 10))
+        
+        con_tema(tk.Label(frame_recordatorio, text="Hora (HH:MM):", font=("Arial", 10)), bg="bg_main", fg="fg_text").pack(side=tk.LEFT, padx=(0, 5))
+        self.entry_hora = tk.Entry(frame_recordatorio, font=("Arial", 10), width=8)
+        self.entry_hora.pack(side=tk.LEFT)
+        
+        self.var_usar_recordatorio = tk.BooleanVar(value=False)
+        self.var_usar_recordatorio.trace_add("write", lambda *args: self._toggle_recordatorio())
+        
+        con_tema(tk.Checkbutton(
+            frame_recordatorio,
+            text="Activar recordatorio",
+            variable=self.var_usar_recordatorio,
+            font=("Arial", 10)
+        ), bg="bg_main", fg="fg_text").pack(side=tk.LEFT, padx=(10, 0))
+        
+        self.var_es_permanente = tk.BooleanVar(value=False)
+        con_tema(tk.Checkbutton(
+            frame_recordatorio,
+            text="🔄 Tarea permanente (diaria desde esta fecha)",
+            variable=self.var_es_permanente,
+            font=("Arial", 10)
+        ), bg="bg_main", fg="fg_text").pack(side=tk.LEFT, padx=(15, 0))
+        
+        frame_importancia = con_tema(tk.Frame(frame_editar), bg="bg_main")
+        frame_importancia.pack(fill=tk.X, pady=(0, 12))
         
-        btn_cerrar = tk.Button(
-            frame_principal,
-            text=t.get("notif_btn_cerrar", "💖 Cerrar"),
-            command=ventana.destroy,
-            bg=t["notif_btn"],
+        con_tema(tk.Label(frame_importancia, text="Importancia:", font=("Arial", 10, "bold")), bg="bg_main", fg="fg_text").pack(side=tk.LEFT, padx=(0, 10))
+        
+        self.var_importancia = tk.StringVar(value="Normal")
+        for opcion, color in (("Normal", "importance_normal"), ("Importante", "importance_importante"), ("Urgente", "importance_urgente")):
+            con_tema(tk.Radiobutton(
+                frame_importancia,
+                text=opcion,
+                variable=self.var_importancia,
+                value=opcion,
+                font=("Arial", 10)
+            ), bg="bg_main", fg="fg_text", selectcolor=color, activebackground="bg_main").pack(side=tk.LEFT, padx=(0, 15))
+        
+        frame_notificaciones = con_tema(tk.Frame(frame_editar), bg="bg_main")
+        frame_notificaciones.pack(fill=tk.X, pady=(0, 15))
+        
+        self.var_notif_sistema = tk.BooleanVar(value=True)
+        con_tema(tk.Label(
+            frame_notificaciones,
+            text="✨ Las notificaciones se enviarán automáticamente ✨",
+            font=("Arial", 10, "bold")
+        ), bg="bg_main", fg="fg_title").pack(side=tk.LEFT)
+        
+        frame_botones = con_tema(tk.Frame(frame_editar), bg="bg_main")
+        frame_botones.pack(fill=tk.X, pady=(15, 0))
+        
+        con_tema(tk.Button(
+            frame_botones,
+            text="💾 Guardar Cambios",
+            command=self.guardar,
+            font=("Arial", 11, "bold"),
+            padx=20,
+            pady=5,
+            cursor="hand2"
+        ), bg="btn_bg", fg="btn_fg").pack(side=tk.LEFT, padx=5)
+        
+        con_tema(tk.Button(
+            frame_botones,
+            text="❌ Cancelar",
+            command=self.cerrar,
             fg="white",
-            font=("Arial", 10, "bold"),
+            font=("Arial", 11, "bold"),
             padx=20,
             pady=5,
-            cursor="hand2",
-            relief=tk.RAISED,
-            bd=3
-        )
-        btn_cerrar.pack()
+            cursor="hand2"
+        ), bg="importance_urgente").pack(side=tk.LEFT, padx=5)
+    
+    def _toggle_recordatorio(self):
+        estado = 'normal' if self.var_usar_recordatorio.get() else 'disabled'
+        self.calendario.config(state=estado)
+        self.entry_hora.config(state=estado)
+    
+    def abrir(self, tarea):
+        """Carga los datos de la tarea (una Tarea) y muestra la ventana."""
+        self.tarea_id = tarea.id
+        fecha_recordatorio = tarea.fecha_recordatorio
         
-        self.animar_brillos(ventana, frame_principal, t["notif_frame"])
+        self.entry_titulo.delete(0, tk.END)
+        self.entry_titulo.insert(0, tarea.titulo)
+        self.text_descripcion.delete("1.0", tk.END)
+        self.text_descripcion.insert("1.0", tarea.descripcion or "")
         
-        # Cerrar automáticamente después de 10 segundos
-        ventana.after(10000, ventana.destroy)
-        
-        # Guardar referencia
-        self.ventanas_notificacion.append(ventana)
-        
-        # Hacer que la ventana aparezca con animación
-        self.animar_entrada(ventana)
-        
-        return ventana
-    
-    def animar_brillos(self, ventana, frame, color_fondo="#FFB6C1"):
-        """Crea partículas de brillo animadas"""
-        canvas = tk.Canvas(frame, width=420, height=260, bg=color_fondo, highlightthickness=0)
-        canvas.pack(fill=tk.BOTH, expand=True)
-        # Bajar el widget canvas al fondo (Canvas.lower() es para ítems, no para el widget)
-        frame.tk.call('lower', canvas._w)
-        
-        particulas = []
-        
-        def crear_particula():
-            x = random.randint(0, 420)
-            y = random.randint(0, 260)
-            size = random.randint(3, 8)
-            particula = canvas.create_oval(
-                x, y, x + size, y + size,
-                fill="#FFD700",
-                outline="#FFA500",
-                width=1
-            )
-            particulas.append({
-                'id': particula,
-                'x': x,
-                'y': y,
-                'vx': random.uniform(-2, 2),
-                'vy': random.uniform(-2, 2),
-                'life': 100,
-                'size': size
-            })
-        
-        def animar_particulas():
-            for p in particulas[:]:
-                p['x'] += p['vx']
-                p['y'] += p['vy']
-                p['life'] -= 1
-                
-                # Actualizar posición
-                canvas.coords(p['id'], 
-                    p['x'], p['y'], 
-                    p['x'] + p['size'], p['y'] + p['size']
-                )
-                
-                # Cambiar opacidad según vida
-                alpha = p['life'] / 100
-                if alpha < 0:
-                    canvas.delete(p['id'])
-                    particulas.remove(p)
+        # Los campos se habilitan antes de escribir en ellos
+        self.var_usar_recordatorio.set(True)
+        self.entry_hora.delete(0, tk.END)
+        momento = tarea.momento_recordatorio
+        if momento is not None:
+            self.calendario.set_date(momento.date())
+            self.entry_hora.insert(0, momento.strftime("%H:%M"))
+        elif fecha_recordatorio:
+            # Tareas permanentes antiguas: solo 'HH:MM'
+            self.entry_hora.insert(0, fecha_recordatorio[:5])
+        self.var_usar_recordatorio.set(fecha_recordatorio is not None)
+        self.var_es_permanente.set(tarea.es_permanente)
+        self.var_importancia.set(tarea.importancia or "Normal")
+        self.var_notif_sistema.set(tarea.notif_sistema)
+        
+        self.ventana.deiconify()
+        self.ventana.lift()
+        self.ventana.grab_set()
+        self.entry_titulo.focus_set()
+    
+    def cerrar(self):
+        """Oculta la ventana para reutilizarla en la próxima edición."""
+        self.tarea_id = None
+        try:
+            self.ventana.grab_release()
+            self.ventana.withdraw()
+        except tk.TclError:
+            pass
+    
+    def guardar(self):
+        """Guarda los cambios realizados en la tarea"""
+        nuevo_titulo = self.entry_titulo.get().strip()
+        if not nuevo_titulo:
+            messagebox.showwarning("Advertencia", "El título no puede estar vacío", parent=self.ventana)
+            return
+        
+        nueva_descripcion = self.text_descripcion.get("1.0", tk.END).strip()
+        
+        # Obtener fecha y hora del recordatorio
+        nueva_fecha_recordatorio = None
+        if self.var_usar_recordatorio.get():
+            fecha_seleccionada = self.calendario.get_date()
+            hora_str = self.entry_hora.get().strip()
             
-            # Crear nuevas partículas ocasionalmente
-            if random.random() < 0.3 and len(particulas) < 20:
-                crear_particula()
+            if not hora_str:
+                messagebox.showwarning("Advertencia", "Por favor ingresa una hora para el recordatorio", parent=self.ventana)
+                return
             
-            if ventana.winfo_exists():
-                ventana.after(50, animar_particulas)
-        
-        # Crear partículas iniciales con más frecuencia
-        for _ in range(15):
-            crear_particula()
+            try:
+                # Validar formato de hora
+                hora_parts = hora_str.split(":")
+                if len(hora_parts) != 2:
+                    raise ValueError
+                hora = int(hora_parts[0])
+                minuto = int(hora_parts[1])
+                if not (0 <= hora <= 23 and 0 <= minuto <= 59):
+                    raise ValueError
+                
+                # Combinar fecha y hora
+                # Para tareas permanentes, la fecha es la fecha de inicio (desde cuándo empezar a notificar diariamente)
+                # Para tareas normales, es la fecha específica del recordatorio
+                nueva_fecha_recordatorio = fecha_seleccionada.strftime("%Y-%m-%d") + f" {hora:02d}:{minuto:02d}:00"
+            except ValueError:
+                messagebox.showerror("Error", "Formato de hora incorrecto. Usa: HH:MM (ejemplo: 14:30)", parent=self.ventana)
+                return
         
-        animar_particulas()
-    
-    def animar_entrada(self, ventana):
-        """Anima la entrada de la notificación"""
-        ventana.attributes('-alpha', 0.0)
+        # Validar que si es permanente, tenga recordatorio
+        es_permanente_nuevo = self.var_es_permanente.get()
+        if es_permanente_nuevo and not nueva_fecha_recordatorio:
+            messagebox.showwarning("Advertencia", "Las tareas permanentes requieren un recordatorio con hora.", parent=self.ventana)
+            return
         
-        def fade_in(alpha=0.0):
-            alpha += 0.1
-            if alpha <= 1.0:
-                ventana.attributes('-alpha', alpha)
-                ventana.after(30, lambda: fade_in(alpha))
+        tarea_id = self.tarea_id
+        # Actualizar la tarea (en la base y en memoria; la lista se entera por el almacén)
+        self.app.almacen.actualizar(
+            tarea_id,
+            titulo=nuevo_titulo,
+            descripcion=nueva_descripcion,
+            fecha_recordatorio=nueva_fecha_recordatorio,
+            notif_sistema=self.var_notif_sistema.get(),
+            notif_correo=False,  # Siempre False ahora
+            importancia=self.var_importancia.get(),
+            es_permanente=es_permanente_nuevo
+        )
         
-        fade_in()
-
-
-class Notificador:
-    """Maneja las notificaciones del sistema"""
-    
-    def __init__(self, parent=None, obtener_tema=None):
-        self.parent = parent
-        self.obtener_tema = obtener_tema or (lambda: "Kawaii")
-        self.notificador_kawaii = NotificacionKawaii(parent)
-    
-    def notificar_sistema(self, titulo, mensaje):
-        """Envía una notificación personalizada con brillos"""
-        try:
-            tema = self.obtener_tema() if self.obtener_tema else "Kawaii"
-            self.notificador_kawaii.crear_notificacion(titulo, mensaje, tema=tema)
-        except Exception as e:
-            print(f"Error al enviar notificación: {e}")
+        messagebox.showinfo("Éxito", "Tarea actualizada correctamente", parent=self.ventana)
+        self.cerrar()
 
 
 class TodoApp:
@@ -602,9 +2236,29 @@ class TodoApp:
         self.recordar_estilo_inicial = recordar
         self.tamaño_ventana_actual = tamaño_inicial
         self.root.configure(bg=TEMAS.get(self.tema_actual, TEMAS["Kawaii"])["bg_main"])
+        # Milisegundos desde el inicio del proceso al terminar cada etapa del arranque
+        self.tiempos_inicio = dict(TIEMPOS_INICIO)
         
         self.db = Database(db_name=db_path or "tareas.db")
-        self.notificador = Notificador(self.root, obtener_tema=lambda: self.tema_actual)
+        self.tiempos_inicio["base_datos"] = ms_desde_inicio()
+        # La lista, la edición y los recordatorios leen las tareas pendientes desde memoria
+        self.almacen = AlmacenTareas(self.db)
+        self.almacen.suscribir(self._al_cambiar_tareas)
+        self.registro_tema = RegistroTema()
+        # Un solo reloj para todas las animaciones; se pausa con la ventana minimizada u oculta
+        self.reloj_animacion = RelojAnimacion(self.root, cargar_calidad_efectos())
+        self.root.bind("<Unmap>", self._al_ocultar_root, add="+")
+        self.root.bind("<Map>", self._al_mostrar_root, add="+")
+        # Todo lo que llega desde otros hilos pasa por esta cola hacia el hilo de Tk
+        self.cola_ui = ColaInterfaz(self.root)
+        self.cola_ui.iniciar()
+        self.notificador = Notificador(
+            self.root,
+            obtener_tema=lambda: self.tema_actual,
+            reloj=self.reloj_animacion,
+            backend=cargar_backend_notificaciones(),
+            ejecutar_en_tk=self.cola_ui.enviar
+        )
         
         # Cursor según tema: Gatos = manita (hand2), Kawaii = heart, resto = arrow
         try:
@@ -613,52 +2267,88 @@ class TodoApp:
         except tk.TclError:
             self.root.config(cursor="arrow")
         
-        # Icono en la bandeja del sistema (system tray)
+        # Icono en la bandeja del sistema (system tray); se crea tras el primer cuadro
         self.tray_icon = None
         self.tray_thread = None
-        if HAS_PYSTRAY:
-            self.configurar_bandeja_sistema()
+        self.planificador = None
+        # Ventana de edición reutilizable (ver _preparar_dialogo_editar)
+        self.dialogo_editar = None
         
         # Configurar cierre para minimizar a la bandeja en lugar de cerrar
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
         
-        # Iniciar hilo para verificar recordatorios
-        self.iniciar_verificador_recordatorios()
-        
         self.crear_interfaz()
         self._aplicar_tamaño_ventana(self.tamaño_ventana_actual)
-        self.actualizar_lista_tareas()
+        self.tiempos_inicio["interfaz"] = ms_desde_inicio()
+        
+        # Lo demás espera a que la ventana se dibuje: after_idle corre tras el primer
+        # ciclo ocioso y el after(1) deja pasar los redibujos que ese ciclo encoló
+        self.root.after_idle(lambda: self.root.after(1, self._completar_inicio))
+    
+    def _completar_inicio(self):
+        """Segunda etapa del arranque, con la ventana ya visible."""
+        self.tiempos_inicio["primer_cuadro"] = ms_desde_inicio()
+        etapas = (
+            ("almacen", self.almacen.cargar),
+            ("lista", self.actualizar_lista_tareas),
+            ("calendario", self._crear_calendario),
+            ("recordatorios", self.iniciar_verificador_recordatorios),
+            ("bandeja", self.configurar_bandeja_sistema),
+        )
+        for nombre, etapa in etapas:
+            try:
+                etapa()
+            except Exception as e:
+                print(f"Error al iniciar ({nombre}): {e}")
+            self.tiempos_inicio[nombre] = ms_desde_inicio()
+        self.root.after_idle(self._informar_tiempos_inicio)
+    
+    def _informar_tiempos_inicio(self):
+        self.tiempos_inicio["listo"] = ms_desde_inicio()
+        # Con AGENDA_TIEMPOS_INICIO=1 se imprime el informe al arrancar
+        if os.environ.get("AGENDA_TIEMPOS_INICIO"):
+            print("Tiempos de inicio (ms): " + json.dumps(self.tiempos_inicio, ensure_ascii=False), flush=True)
+        # AGENDA_SALIR_TRAS_INICIO=1 cierra la app al terminar de arrancar (benchmark_inicio.py)
+        if os.environ.get("AGENDA_SALIR_TRAS_INICIO"):
+            self.root.after(0, self.cerrar_aplicacion)
+            return
+        # La ventana de edición se arma con la app ya ociosa: la primera edición abre al instante
+        self.root.after(500, self._preparar_dialogo_editar)
     
     def get_tema(self):
         """Devuelve el diccionario de colores del tema actual."""
         return TEMAS.get(self.tema_actual, TEMAS["Kawaii"])
     
+    def _con_tema(self, widget, **roles):
+        """Registra los colores/textos del tema que usa un widget y se los aplica.
+        Cada rol es opción=clave del tema, o opción=(clave, valor por defecto)."""
+        return self.registro_tema.registrar(widget, self.get_tema(), **roles)
+    
     def crear_interfaz(self):
         """Crea la interfaz gráfica de la aplicación"""
         t = self.get_tema()
         self.root.configure(bg=t["bg_main"])
         
         # Frame principal
-        self.main_frame = tk.Frame(self.root, bg=t["bg_main"], padx=15, pady=12)
+        self.main_frame = self._con_tema(tk.Frame(self.root, padx=15, pady=12), bg="bg_main")
         self.main_frame.pack(fill=tk.BOTH, expand=True)
-        self.main_frame.bind("<Configure>", self._actualizar_wraplength)
+        # <Configure> de main_frame, frame_lista y tree pasan por el gestor (una pasada por cuadro)
+        self.disposicion = GestorDisposicion(self.root)
+        self.disposicion.registrar(self.main_frame, self._actualizar_wraplength)
         
         # Fila superior: Título en una línea, controles en la siguiente (responsivo)
-        frame_titulo = tk.Frame(self.main_frame, bg=t["bg_main"])
+        frame_titulo = self._con_tema(tk.Frame(self.main_frame), bg="bg_main")
         frame_titulo.pack(fill=tk.X, pady=(0, 6))
         
-        self.titulo_label = tk.Label(
+        self.titulo_label = self._con_tema(tk.Label(
             frame_titulo,
-            text=t.get("titulo_principal", "📝 AGENDA VIRTUAL"),
-            font=("Arial", 22, "bold"),
-            bg=t["bg_main"],
-            fg=t["fg_title"]
-        )
+            font=("Arial", 22, "bold")
+        ), text=("titulo_principal", "📝 AGENDA VIRTUAL"), bg="bg_main", fg="fg_title")
         self.titulo_label.pack(anchor=tk.W)
         
-        frame_estilo = tk.Frame(frame_titulo, bg=t["bg_main"])
+        frame_estilo = self._con_tema(tk.Frame(frame_titulo), bg="bg_main")
         frame_estilo.pack(fill=tk.X, pady=(4, 0))
-        tk.Label(frame_estilo, text="Estilo:", bg=t["bg_main"], font=("Arial", 10), fg=t["fg_text"]).pack(side=tk.LEFT, padx=(0, 5))
+        self._con_tema(tk.Label(frame_estilo, text="Estilo:", font=("Arial", 10)), bg="bg_main", fg="fg_text").pack(side=tk.LEFT, padx=(0, 5))
         self.var_tema = tk.StringVar(value=self.tema_actual)
         self.combo_tema = ttk.Combobox(
             frame_estilo,
@@ -671,22 +2361,19 @@ class TodoApp:
         self.combo_tema.pack(side=tk.LEFT, padx=(0, 12))
         self.combo_tema.bind("<<ComboboxSelected>>", self._cambiar_tema)
         self.var_recordar_estilo = tk.BooleanVar(value=getattr(self, "recordar_estilo_inicial", True))
-        self.check_recordar_estilo = tk.Checkbutton(
+        self.check_recordar_estilo = self._con_tema(tk.Checkbutton(
             frame_estilo,
             text="Mantener al iniciar",
             variable=self.var_recordar_estilo,
-            bg=t["bg_main"],
-            fg=t["fg_text"],
             font=("Arial", 10),
-            activebackground=t["bg_main"],
             command=self._guardar_recordar_estilo
-        )
+        ), bg="bg_main", fg="fg_text", activebackground="bg_main")
         self.check_recordar_estilo.pack(side=tk.LEFT)
         
         # Tamaño de ventana en su propia fila (así se ve en ancho pequeño y se puede cambiar)
-        frame_tamaño = tk.Frame(frame_titulo, bg=t["bg_main"])
+        frame_tamaño = self._con_tema(tk.Frame(frame_titulo), bg="bg_main")
         frame_tamaño.pack(fill=tk.X, pady=(6, 0))
-        tk.Label(frame_tamaño, text="Tamaño:", bg=t["bg_main"], font=("Arial", 10), fg=t["fg_text"]).pack(side=tk.LEFT, padx=(0, 5))
+        self._con_tema(tk.Label(frame_tamaño, text="Tamaño:", font=("Arial", 10)), bg="bg_main", fg="fg_text").pack(side=tk.LEFT, padx=(0, 5))
         self.var_tamaño = tk.StringVar(value=self._etiqueta_tamaño(self.tamaño_ventana_actual))
         self.combo_tamaño = ttk.Combobox(
             frame_tamaño,
@@ -699,45 +2386,54 @@ class TodoApp:
         self.combo_tamaño.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(0, 5))
         self.combo_tamaño.bind("<<ComboboxSelected>>", self._cambiar_tamaño_ventana)
         
+        self._con_tema(tk.Label(frame_tamaño, text="Efectos:", font=("Arial", 10)), bg="bg_main", fg="fg_text").pack(side=tk.LEFT, padx=(5, 5))
+        self.var_efectos = tk.StringVar(value=next(
+            (etiqueta for etiqueta, valor in CALIDADES_EFECTOS.items() if valor == self.reloj_animacion.calidad),
+            "Automáticos"
+        ))
+        self.combo_efectos = ttk.Combobox(
+            frame_tamaño,
+            textvariable=self.var_efectos,
+            values=list(CALIDADES_EFECTOS.keys()),
+            state="readonly",
+            width=12,
+            font=("Arial", 10)
+        )
+        self.combo_efectos.pack(side=tk.LEFT, padx=(0, 5))
+        self.combo_efectos.bind("<<ComboboxSelected>>", self._cambiar_calidad_efectos)
+        
         # Frame para agregar tareas
-        self.frame_agregar = tk.LabelFrame(
+        self.frame_agregar = self._con_tema(tk.LabelFrame(
             self.main_frame,
-            text=t.get("titulo_nueva_tarea", "➕ Nueva Tarea"),
             font=("Arial", 11, "bold"),
-            bg=t["bg_main"],
-            fg=t["fg_title"],
             padx=8,
             pady=6
-        )
+        ), text=("titulo_nueva_tarea", "➕ Nueva Tarea"), bg="bg_main", fg="fg_title")
         self.frame_agregar.pack(fill=tk.X, pady=(0, 6))
         
         # Título de la tarea
-        tk.Label(
+        self._con_tema(tk.Label(
             self.frame_agregar,
             text="Título:",
-            bg=t["bg_main"],
-            fg=t["fg_text"],
             font=("Arial", 10)
-        ).pack(anchor=tk.W)
+        ), bg="bg_main", fg="fg_text").pack(anchor=tk.W)
         self.entry_titulo = tk.Entry(self.frame_agregar, font=("Arial", 11), width=30)
         self.entry_titulo.pack(fill=tk.X, pady=(4, 6))
         
         # Descripción
-        tk.Label(
+        self._con_tema(tk.Label(
             self.frame_agregar,
             text="Descripción:",
-            bg=t["bg_main"],
-            fg=t["fg_text"],
             font=("Arial", 10)
-        ).pack(anchor=tk.W)
+        ), bg="bg_main", fg="fg_text").pack(anchor=tk.W)
         self.text_descripcion = tk.Text(self.frame_agregar, font=("Arial", 10), height=2, width=30)
         self.text_descripcion.pack(fill=tk.X, pady=(4, 6))
         
         # Frame para recordatorio
-        frame_recordatorio = tk.Frame(self.frame_agregar, bg=t["bg_main"])
+        frame_recordatorio = self._con_tema(tk.Frame(self.frame_agregar), bg="bg_main")
         frame_recordatorio.pack(fill=tk.X, pady=(0, 8))
         
-        frame_fila1 = tk.Frame(frame_recordatorio, bg=t["bg_main"])
+        frame_fila1 = self._con_tema(tk.Frame(frame_recordatorio), bg="bg_main")
         frame_fila1.pack(fill=tk.X, pady=(0, 5))
         
         self.var_usar_recordatorio = tk.BooleanVar(value=False)
@@ -745,135 +2441,129 @@ class TodoApp:
         def toggle_recordatorio():
             estado = self.var_usar_recordatorio.get()
             if estado:
-                self.calendario.config(state='normal')
+                if self.calendario is not None:
+                    self.calendario.config(state='normal')
                 self.entry_hora.config(state='normal')
             else:
-                self.calendario.config(state='disabled')
+                if self.calendario is not None:
+                    self.calendario.config(state='disabled')
                 self.entry_hora.config(state='disabled')
                 self.var_es_permanente.set(False)
         
         self.var_usar_recordatorio.trace('w', lambda *args: toggle_recordatorio())
         
-        checkbox_recordatorio = tk.Checkbutton(
+        checkbox_recordatorio = self._con_tema(tk.Checkbutton(
             frame_fila1,
             text="Activar recordatorio",
             variable=self.var_usar_recordatorio,
-            bg=t["bg_main"],
-            fg=t["fg_text"],
             font=("Arial", 10, "bold"),
             command=toggle_recordatorio
-        )
+        ), bg="bg_main", fg="fg_text")
         checkbox_recordatorio.pack(side=tk.LEFT, padx=(0, 15))
         
         self.var_es_permanente = tk.BooleanVar(value=False)
         self._texto_checkbox_permanente_largo = "🔄 Tarea permanente (diaria desde esta fecha)"
         self._texto_checkbox_permanente_corto = "TP"
-        self.checkbox_permanente = tk.Checkbutton(
+        self.checkbox_permanente = self._con_tema(tk.Checkbutton(
             frame_fila1,
             text=self._texto_checkbox_permanente_largo,
             variable=self.var_es_permanente,
-            bg=t["bg_main"],
-            font=("Arial", 10),
-            fg=t["fg_text"]
-        )
+            font=("Arial", 10)
+        ), bg="bg_main", fg="fg_text")
         self.checkbox_permanente.pack(side=tk.LEFT)
         self._actualizar_texto_checkbox_permanente()
         
-        frame_fila2 = tk.Frame(frame_recordatorio, bg=t["bg_main"])
+        frame_fila2 = self._con_tema(tk.Frame(frame_recordatorio), bg="bg_main")
         frame_fila2.pack(fill=tk.X)
         
-        tk.Label(frame_fila2, text="Fecha:", bg=t["bg_main"], fg=t["fg_text"], font=("Arial", 10)).pack(side=tk.LEFT, padx=(0, 5))
-        
-        self.calendario = DateEntry(
-            frame_fila2,
-            width=12,
-            background=t["calendar_bg"],
-            foreground=t["calendar_fg"],
-            borderwidth=2,
-            date_pattern='yyyy-mm-dd',
-            font=("Arial", 10)
-        )
-        self.calendario.pack(side=tk.LEFT, padx=(0, 15))
+        self._con_tema(tk.Label(frame_fila2, text="Fecha:", font=("Arial", 10)), bg="bg_main", fg="fg_text").pack(side=tk.LEFT, padx=(0, 5))
         
-        tk.Label(frame_fila2, text="Hora (HH:MM):", bg=t["bg_main"], fg=t["fg_text"], font=("Arial", 10)).pack(side=tk.LEFT, padx=(0, 5))
+        # El selector de fecha (tkcalendar) se crea después de mostrar la ventana: ver _crear_calendario
+        self.calendario = None
+        self._label_hora = self._con_tema(tk.Label(frame_fila2, text="Hora (HH:MM):", font=("Arial", 10)), bg="bg_main", fg="fg_text")
+        self._label_hora.pack(side=tk.LEFT, padx=(0, 5))
         self.entry_hora = tk.Entry(frame_fila2, font=("Arial", 10), width=8)
         self.entry_hora.pack(side=tk.LEFT)
         self.entry_hora.insert(0, "09:00")
         
-        self.calendario.config(state='disabled')
         self.entry_hora.config(state='disabled')
         
         # Importancia
-        frame_importancia = tk.Frame(self.frame_agregar, bg=t["bg_main"])
+        frame_importancia = self._con_tema(tk.Frame(self.frame_agregar), bg="bg_main")
         frame_importancia.pack(fill=tk.X, pady=(0, 6))
         
-        tk.Label(
+        self._con_tema(tk.Label(
             frame_importancia,
             text="Importancia:",
-            bg=t["bg_main"],
-            fg=t["fg_text"],
             font=("Arial", 10, "bold")
-        ).pack(side=tk.LEFT, padx=(0, 10))
+        ), bg="bg_main", fg="fg_text").pack(side=tk.LEFT, padx=(0, 10))
         
         self.var_importancia = tk.StringVar(value="Normal")
         for opcion in ["Normal", "Importante", "Urgente"]:
-            color = t["importance_normal"] if opcion == "Normal" else t["importance_importante"] if opcion == "Importante" else t["importance_urgente"]
-            tk.Radiobutton(
+            self._con_tema(tk.Radiobutton(
                 frame_importancia,
                 text=opcion,
                 variable=self.var_importancia,
                 value=opcion,
-                bg=t["bg_main"],
-                fg=t["fg_text"],
-                font=("Arial", 10),
-                selectcolor=color,
-                activebackground=t["bg_main"]
-            ).pack(side=tk.LEFT, padx=(0, 15))
-        
-        frame_notificaciones = tk.Frame(self.frame_agregar, bg=t["bg_main"])
+                font=("Arial", 10)
+            ), bg="bg_main", fg="fg_text", selectcolor="importance_" + opcion.lower(), activebackground="bg_main").pack(side=tk.LEFT, padx=(0, 15))
+        
+        frame_notificaciones = self._con_tema(tk.Frame(self.frame_agregar), bg="bg_main")
         frame_notificaciones.pack(fill=tk.X, pady=(0, 6))
         
         self.var_notif_sistema = tk.BooleanVar(value=True)
-        self.label_notif = tk.Label(
+        self.label_notif = self._con_tema(tk.Label(
             frame_notificaciones,
-            text=t.get("msg_notif", "✨ Las notificaciones se enviarán automáticamente a tu sistema. ✨"),
-            bg=t["bg_main"],
             font=("Arial", 10, "bold"),
-            fg=t["fg_title"],
             wraplength=400,
             justify=tk.LEFT
-        )
+        ), text=("msg_notif", "✨ Las notificaciones se enviarán automáticamente a tu sistema. ✨"), bg="bg_main", fg="fg_title")
         self.label_notif.pack(anchor=tk.W)
         
-        self.btn_agregar = tk.Button(
+        self.btn_agregar = self._con_tema(tk.Button(
             self.frame_agregar,
-            text=t.get("btn_agregar_text", "➕ Agregar Tarea"),
             command=self.agregar_tarea,
-            bg=t["btn_bg"],
-            fg=t["btn_fg"],
             font=("Arial", 11, "bold"),
             padx=20,
             pady=5,
             cursor="hand2"
-        )
+        ), text=("btn_agregar_text", "➕ Agregar Tarea"), bg="btn_bg", fg="btn_fg")
         self.btn_agregar.pack(pady=(5, 0))
         
         # Lista de tareas
-        self.frame_lista = tk.LabelFrame(
+        self.frame_lista = self._con_tema(tk.LabelFrame(
             self.main_frame,
-            text=t.get("titulo_tareas_pendientes", "📋 Tareas Pendientes"),
             font=("Arial", 11, "bold"),
-            bg=t["bg_main"],
-            fg=t["fg_title"],
             padx=8,
             pady=6
-        )
+        ), text=("titulo_tareas_pendientes", "📋 Tareas Pendientes"), bg="bg_main", fg="fg_title")
         self.frame_lista.pack(fill=tk.BOTH, expand=True, pady=(6, 6))
         
         self._aplicar_estilo_ttk()
         
+        # Búsqueda por título y descripción (filtra la misma lista)
+        frame_busqueda = self._con_tema(tk.Frame(self.frame_lista), bg="bg_main")
+        frame_busqueda.pack(side=tk.TOP, fill=tk.X, pady=(0, 6))
+        self._con_tema(tk.Label(frame_busqueda, text="🔍 Buscar:", font=("Arial", 10)), bg="bg_main", fg="fg_text").pack(side=tk.LEFT, padx=(0, 5))
+        self.var_busqueda = tk.StringVar()
+        self.entry_busqueda = tk.Entry(frame_busqueda, textvariable=self.var_busqueda, font=("Arial", 10))
+        self.entry_busqueda.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        self.entry_busqueda.bind("<Escape>", lambda e: self.var_busqueda.set(""))
+        self._busqueda_activa = False
+        self._busqueda_after = None
+        self.var_busqueda.trace_add("write", lambda *args: self._programar_busqueda())
+        
         columns = ("ID", "Título", "Descripción", "Importancia", "Recordatorio")
-        self.tree = ttk.Treeview(self.frame_lista, columns=columns, show="headings", height=8)
+        # selectmode extended: Ctrl/Shift + clic para aplicar una acción a varias tareas
+        self.tree = ttk.Treeview(self.frame_lista, columns=columns, show="headings", height=8, selectmode="extended")
+        # Modelo de lo que muestra el Treeview (iid = str(id)): tarea_id -> (clave, valores, tag)
+        self._filas_tree = {}
+        self._orden_tree = []  # claves de orden, en el mismo orden que las filas
+        self._configurar_tags_tree()
+        # Modo virtual: el Treeview solo contiene las filas visibles; el resto queda en el almacén
+        self._modo_virtual = False
+        self._virtual_total = 0
+        self._virtual_inicio = 0        # índice (en la lista completa) de la primera fila visible
         
         self.tree.heading("ID", text="ID")
         self.tree.heading("Título", text="Título")
@@ -886,66 +2576,96 @@ class TodoApp:
         for col, w in self._tree_min_widths.items():
             self.tree.column(col, width=w, minwidth=w)
         
-        scrollbar = ttk.Scrollbar(self.frame_lista, orient=tk.VERTICAL, command=self.tree.yview)
-        self.tree.configure(yscrollcommand=scrollbar.set)
+        self.scrollbar_tree = ttk.Scrollbar(self.frame_lista, orient=tk.VERTICAL, command=self._desplazar_lista)
+        self.tree.configure(yscrollcommand=self._al_desplazar_tree)
+        for evento in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self.tree.bind(evento, self._rueda_lista)
+        self.disposicion.registrar(self.tree, self._al_redimensionar_tree, medida=lambda e: e.height, paso=1)
+        
+        self.menu_lista = tk.Menu(self.tree, tearoff=0)
+        for importancia in ("Normal", "Importante", "Urgente"):
+            self.menu_lista.add_command(
+                label=f"Marcar como {importancia}",
+                command=lambda importancia=importancia: self.cambiar_importancia_seleccion(importancia)
+            )
+        self.menu_lista.add_separator()
+        self.menu_lista.add_command(label="✓ Completar", command=self.marcar_completada)
+        self.menu_lista.add_command(label="🗑️ Eliminar", command=self.eliminar_tarea)
+        self.tree.bind("<Button-3>", self._mostrar_menu_lista)
+        self.tree.bind("<Button-2>", self._mostrar_menu_lista)  # macOS
         
         self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        self.frame_lista.bind("<Configure>", self._ajustar_columnas_tree)
+        self.scrollbar_tree.pack(side=tk.RIGHT, fill=tk.Y)
+        self._columnas_por_ancho = {}   # ancho (por tramo) -> anchos de columna ya calculados
+        self._columnas_aplicadas = {}
+        self.disposicion.registrar(self.frame_lista, self._ajustar_columnas_tree)
         self.root.after(100, self._ajustar_columnas_tree)
         
-        self.frame_acciones = tk.Frame(self.main_frame, bg=t["bg_main"])
+        self.frame_acciones = self._con_tema(tk.Frame(self.main_frame), bg="bg_main")
         self.frame_acciones.pack(fill=tk.X, pady=(0, 0))
         
-        self.btn_editar = tk.Button(
+        self.btn_editar = self._con_tema(tk.Button(
             self.frame_acciones,
             text="✏️ Editar",
             command=self.editar_tarea,
-            bg=t["btn_bg"],
-            fg=t["btn_fg"],
             font=("Arial", 10, "bold"),
             padx=15,
             pady=5,
             cursor="hand2"
-        )
-        self.btn_completar = tk.Button(
+        ), bg="btn_bg", fg="btn_fg")
+        self.btn_completar = self._con_tema(tk.Button(
             self.frame_acciones,
             text="✓ Completar",
             command=self.marcar_completada,
-            bg=t["importance_normal"],
             fg="black",
             font=("Arial", 10, "bold"),
             padx=15,
             pady=5,
             cursor="hand2"
-        )
-        self.btn_eliminar = tk.Button(
+        ), bg="importance_normal")
+        self.btn_eliminar = self._con_tema(tk.Button(
             self.frame_acciones,
             text="🗑️ Eliminar",
             command=self.eliminar_tarea,
-            bg=t["importance_urgente"],
             fg="white",
             font=("Arial", 10, "bold"),
             padx=15,
             pady=5,
             cursor="hand2"
-        )
-        self.btn_refrescar = tk.Button(
+        ), bg="importance_urgente")
+        self.btn_refrescar = self._con_tema(tk.Button(
             self.frame_acciones,
             text="🔄 Refrescar",
-            command=self.actualizar_lista_tareas,
-            bg=t["importance_importante"],
+            command=self.recargar_desde_base,
             fg="black",
             font=("Arial", 10, "bold"),
             padx=15,
             pady=5,
             cursor="hand2"
-        )
+        ), bg="importance_importante")
         self._reorganizar_botones_acciones()
     
+    def _crear_calendario(self):
+        """Crea el selector de fecha del formulario (importa tkcalendar al primer uso)."""
+        DateEntry = importar_diferido("tkcalendar").DateEntry
+        self.calendario = self._con_tema(DateEntry(
+            self._label_hora.master,
+            width=12,
+            borderwidth=2,
+            date_pattern='yyyy-mm-dd',
+            font=("Arial", 10)
+        ), background="calendar_bg", foreground="calendar_fg")
+        self.calendario.pack(side=tk.LEFT, padx=(0, 15), before=self._label_hora)
+        if not self.var_usar_recordatorio.get():
+            self.calendario.config(state='disabled')
+    
     def _reorganizar_botones_acciones(self):
         """En Mediano/Pantalla completa: los 4 botones en una fila con ancho proporcional. En Pequeño: dos filas de dos."""
-        if self.tamaño_ventana_actual == "pequeño":
+        disposicion = "dos_filas" if self.tamaño_ventana_actual == "pequeño" else "una_fila"
+        if disposicion == getattr(self, "_disposicion_botones", None):
+            return  # Ya están así: no volver a hacer grid de los 4 botones
+        self._disposicion_botones = disposicion
+        if disposicion == "dos_filas":
             for c in range(2):
                 self.frame_acciones.columnconfigure(c, weight=1)
             self.btn_editar.grid(row=0, column=0, padx=5, pady=2, sticky="ew")
@@ -1028,38 +2748,62 @@ class TodoApp:
         guardar_tema(tamaño_ventana=modo)
         self._aplicar_tamaño_ventana(modo)
     
-    def _actualizar_wraplength(self, event=None):
+    def _cambiar_calidad_efectos(self, event=None):
+        """Cambia la calidad de los efectos de las notificaciones y guarda la preferencia."""
+        calidad = CALIDADES_EFECTOS.get(self.var_efectos.get(), "automatica")
+        self.reloj_animacion.establecer_calidad(calidad)
+        guardar_tema(calidad_efectos=calidad)
+    
+    def _actualizar_wraplength(self, ancho):
         """Actualiza el wraplength del mensaje de notificaciones al redimensionar."""
         try:
-            if event and event.width > 100 and hasattr(self, "label_notif"):
-                self.label_notif.config(wraplength=max(150, event.width - 80))
+            if ancho > 100 and hasattr(self, "label_notif"):
+                self.label_notif.config(wraplength=max(150, ancho - 80))
         except (tk.TclError, AttributeError):
             pass
     
-    def _ajustar_columnas_tree(self, event=None):
+    def _calcular_columnas_tree(self, w):
+        """Anchos de las columnas del Treeview para un ancho de frame_lista (con caché por ancho)."""
+        columnas = self._columnas_por_ancho.get(w)
+        if columnas is not None:
+            return columnas
+        scrollbar_w = 20
+        disponible = max(0, w - scrollbar_w - 20)
+        minimos = self._tree_min_widths
+        min_id = minimos["ID"]
+        min_imp = minimos["Importancia"]
+        resto = disponible - min_id - min_imp
+        if resto < 0:
+            columnas = {
+                "ID": max(min_id, min_id + resto),
+                "Importancia": max(min_imp, min_imp + resto),
+                "Título": minimos["Título"],
+                "Descripción": minimos["Descripción"],
+                "Recordatorio": minimos["Recordatorio"],
+            }
+        else:
+            # Proporciones: Título 25%, Descripción 40%, Recordatorio 35%
+            columnas = {
+                "ID": min_id,
+                "Importancia": min_imp,
+                "Título": max(minimos["Título"], int(resto * 0.25)),
+                "Descripción": max(minimos["Descripción"], int(resto * 0.40)),
+                "Recordatorio": max(minimos["Recordatorio"], int(resto * 0.35)),
+            }
+        self._columnas_por_ancho[w] = columnas
+        return columnas
+    
+    def _ajustar_columnas_tree(self, ancho=None):
         """Redistribuye el ancho de las columnas del Treeview al redimensionar la ventana."""
         try:
-            w = self.frame_lista.winfo_width()
+            w = ancho if ancho is not None else self.frame_lista.winfo_width()
             if w <= 1:
                 return
-            scrollbar_w = 20
-            disponible = max(0, w - scrollbar_w - 20)
-            min_id = self._tree_min_widths["ID"]
-            min_imp = self._tree_min_widths["Importancia"]
-            resto = disponible - min_id - min_imp
-            if resto < 0:
-                self.tree.column("ID", width=max(min_id, min_id + resto))
-                self.tree.column("Importancia", width=max(min_imp, min_imp + resto))
-                self.tree.column("Título", width=self._tree_min_widths["Título"])
-                self.tree.column("Descripción", width=self._tree_min_widths["Descripción"])
-                self.tree.column("Recordatorio", width=self._tree_min_widths["Recordatorio"])
-                return
-            # Proporciones: Título 25%, Descripción 40%, Recordatorio 35%
-            self.tree.column("ID", width=min_id)
-            self.tree.column("Importancia", width=min_imp)
-            self.tree.column("Título", width=max(self._tree_min_widths["Título"], int(resto * 0.25)))
-            self.tree.column("Descripción", width=max(self._tree_min_widths["Descripción"], int(resto * 0.40)))
-            self.tree.column("Recordatorio", width=max(self._tree_min_widths["Recordatorio"], int(resto * 0.35)))
+            for columna, ancho_columna in self._calcular_columnas_tree(w).items():
+                # Solo se toca la columna si cambió su ancho
+                if self._columnas_aplicadas.get(columna) != ancho_columna:
+                    self.tree.column(columna, width=ancho_columna)
+                    self._columnas_aplicadas[columna] = ancho_columna
         except (tk.TclError, AttributeError):
             pass
     
@@ -1072,44 +2816,16 @@ class TodoApp:
         guardar_tema(nuevo, recordar_estilo=self.var_recordar_estilo.get())
         t = self.get_tema()
         self.root.configure(bg=t["bg_main"])
-        self._aplicar_tema_recursivo(self.main_frame, t)
+        # Colores y textos (emojis Gatos, etc.) de los widgets registrados al crearlos
+        self.registro_tema.aplicar(nuevo)
         self._aplicar_estilo_ttk()
-        self.tree.tag_configure("urgente", background=t["bg_main"], foreground=t["importance_urgente"])
-        self.tree.tag_configure("importante", background=t["bg_main"], foreground=t["importance_importante"])
-        # Actualizar textos según tema (emojis Gatos, etc.)
-        self.titulo_label.config(text=t.get("titulo_principal", "📝 AGENDA VIRTUAL"))
-        self.frame_agregar.config(text=t.get("titulo_nueva_tarea", "➕ Nueva Tarea"), fg=t["fg_title"])
-        self.frame_lista.config(text=t.get("titulo_tareas_pendientes", "📋 Tareas Pendientes"), fg=t["fg_title"])
-        self.btn_agregar.config(text=t.get("btn_agregar_text", "➕ Agregar Tarea"))
-        self.label_notif.config(text=t.get("msg_notif", "✨ Las notificaciones se enviarán automáticamente a tu sistema. ✨"))
+        self._configurar_tags_tree()
         try:
             cursor_tema = "hand2" if self.tema_actual == "Gatos" else "heart" if self.tema_actual == "Kawaii" else "arrow"
             self.root.config(cursor=cursor_tema)
         except tk.TclError:
             pass
     
-    def _aplicar_tema_recursivo(self, widget, t):
-        """Aplica colores del tema a un widget y sus hijos (tk)."""
-        try:
-            if isinstance(widget, tk.LabelFrame):
-                widget.configure(bg=t["bg_main"], fg=t["fg_title"])
-            elif isinstance(widget, (tk.Frame, tk.Toplevel)):
-                widget.configure(bg=t["bg_main"])
-            elif isinstance(widget, tk.Label):
-                widget.configure(bg=t["bg_main"])
-                font_str = str(widget.cget("font"))
-                widget.configure(fg=t["fg_title"] if "22" in font_str or "bold" in font_str.lower() else t["fg_text"])
-            elif isinstance(widget, tk.Button):
-                widget.configure(bg=t["btn_bg"], fg=t["btn_fg"])
-            elif isinstance(widget, tk.Checkbutton):
-                widget.configure(bg=t["bg_main"], fg=t["fg_text"])
-            elif isinstance(widget, tk.Radiobutton):
-                widget.configure(bg=t["bg_main"], fg=t["fg_text"], activebackground=t["bg_main"])
-        except (tk.TclError, Exception):
-            pass
-        for child in widget.winfo_children():
-            self._aplicar_tema_recursivo(child, t)
-    
     def agregar_tarea(self):
         """Agrega una nueva tarea"""
         titulo = self.entry_titulo.get().strip()
@@ -1150,12 +2866,7 @@ class TodoApp:
                 # Validar que la fecha/hora no sea en el pasado (solo para tareas no permanentes)
                 # Para permanentes, permitimos fecha pasada porque empezará desde hoy en adelante
                 if not es_permanente:
-                    tz_chile = pytz.timezone('America/Santiago')
-                    ahora_chile = datetime.now(tz_chile)
-                    fecha_recordatorio_dt = datetime.strptime(fecha_recordatorio, "%Y-%m-%d %H:%M:%S")
-                    fecha_recordatorio_dt = tz_chile.localize(fecha_recordatorio_dt)
-                    
-                    if fecha_recordatorio_dt < ahora_chile:
+                    if a_epoch(leer_fecha(fecha_recordatorio)) < time.time():
                         respuesta = messagebox.askyesno(
                             "Advertencia",
                             "La fecha y hora del recordatorio es en el pasado. ¿Deseas continuar de todas formas?"
@@ -1174,7 +2885,7 @@ class TodoApp:
             messagebox.showwarning("Advertencia", "Las tareas permanentes requieren un recordatorio con hora.")
             return
         
-        self.db.agregar_tarea(
+        self.almacen.agregar(
             titulo,
             descripcion,
             fecha_recordatorio,
@@ -1195,365 +2906,365 @@ class TodoApp:
         self.var_notif_sistema.set(True)
         
         messagebox.showinfo("Éxito", "Tarea agregada correctamente")
-        self.actualizar_lista_tareas()
     
-    def actualizar_lista_tareas(self):
-        """Actualiza la lista de tareas en el Treeview"""
-        # Limpiar lista actual
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-        
-        # Obtener tareas pendientes
-        tareas = self.db.obtener_tareas(completadas=False)
-        
-        for tarea in tareas:
-            # Manejar formato con o sin es_permanente
-            if len(tarea) == 10:
-                tarea_id, titulo, descripcion, fecha_creacion, fecha_recordatorio, _, _, _, importancia, es_permanente = tarea
-            else:
-                tarea_id, titulo, descripcion, fecha_creacion, fecha_recordatorio, _, _, _, importancia = tarea
-                es_permanente = False
-            
-            descripcion_corta = descripcion[:40] + "..." if descripcion and len(descripcion) > 40 else (descripcion or "")
-            
-            # Formatear fecha de recordatorio: agregar indicador si es permanente
-            if fecha_recordatorio:
-                try:
-                    fecha_obj = datetime.strptime(fecha_recordatorio, "%Y-%m-%d %H:%M:%S")
-                    if es_permanente:
-                        fecha_recordatorio_str = f"🔄 Diario {fecha_obj.strftime('%H:%M')}"
-                    else:
-                        fecha_recordatorio_str = fecha_recordatorio
-                except:
-                    fecha_recordatorio_str = fecha_recordatorio
-            else:
-                fecha_recordatorio_str = "Sin recordatorio"
-            
-            importancia_str = importancia or "Normal"
-            
-            # Colorear según importancia
-            tag = ""
-            if importancia_str == "Urgente":
-                tag = "urgente"
-            elif importancia_str == "Importante":
-                tag = "importante"
-            
-            item = self.tree.insert("", tk.END, values=(
-                tarea_id,
-                titulo,
-                descripcion_corta,
-                importancia_str,
-                fecha_recordatorio_str
-            ), tags=(tag,))
-        
-        # Configurar colores para las etiquetas según tema
+    def _configurar_tags_tree(self):
+        """Colores de las filas según importancia y tema."""
         t = self.get_tema()
         self.tree.tag_configure("urgente", background=t["bg_main"], foreground=t["importance_urgente"])
         self.tree.tag_configure("importante", background=t["bg_main"], foreground=t["importance_importante"])
     
+    @staticmethod
+    def _fila_tree(tarea):
+        """Convierte una Tarea en (clave de orden, valores, tag) para el Treeview."""
+        descripcion = tarea.descripcion
+        fecha_recordatorio = tarea.fecha_recordatorio
+        importancia = tarea.importancia
+        
+        descripcion_corta = descripcion[:40] + "..." if descripcion and len(descripcion) > 40 else (descripcion or "")
+        
+        # Formatear fecha de recordatorio: agregar indicador si es permanente
+        if fecha_recordatorio:
+            if tarea.es_permanente:
+                hora = fecha_recordatorio[11:16] if len(fecha_recordatorio) >= 16 else fecha_recordatorio[:5]
+                fecha_recordatorio_str = f"🔄 Diario {hora}"
+            else:
+                fecha_recordatorio_str = fecha_recordatorio
+        else:
+            fecha_recordatorio_str = "Sin recordatorio"
+        
+        importancia_str = importancia or "Normal"
+        
+        # Colorear según importancia
+        tag = ""
+        if importancia_str == "Urgente":
+            tag = "urgente"
+        elif importancia_str == "Importante":
+            tag = "importante"
+        
+        valores = (tarea.id, tarea.titulo, descripcion_corta, importancia_str, fecha_recordatorio_str)
+        return tarea.clave, valores, tag
+    
+    def _programar_busqueda(self):
+        """Espera a que el usuario deje de escribir antes de buscar."""
+        if self._busqueda_after is not None:
+            self.root.after_cancel(self._busqueda_after)
+        self._busqueda_after = self.root.after(250, self._ejecutar_busqueda)
+    
+    def _ejecutar_busqueda(self):
+        self._busqueda_after = None
+        self.actualizar_lista_tareas()
+    
+    def recargar_desde_base(self):
+        """Vuelve a leer las tareas de la base (botón Refrescar), por si se escribió por fuera
+        de la app, y rearma los recordatorios y la lista."""
+        try:
+            self.almacen.cargar()
+        except Exception as e:
+            print(f"Error al recargar las tareas: {e}")
+            return
+        if self.planificador:
+            self.planificador.recargar()
+        self.actualizar_lista_tareas()
+    
+    def actualizar_lista_tareas(self):
+        """Actualiza la lista de tareas pendientes (o los resultados de la búsqueda).
+        Con muchas tareas pasa al modo virtual (solo se cargan las filas visibles)."""
+        texto = self.var_busqueda.get().strip()
+        self._busqueda_activa = bool(texto)
+        if self._busqueda_activa:
+            # Resultados ordenados por relevancia
+            self._modo_virtual = False
+            self._sincronizar_tree(self.almacen.buscar(texto))
+            return
+        total = len(self.almacen)
+        if total > UMBRAL_LISTA_VIRTUAL:
+            self._modo_virtual = True
+            self._virtual_total = total
+            self._mostrar_ventana_virtual()
+            return
+        self._modo_virtual = False
+        self._sincronizar_tree(self.almacen.listar())
+    
+    def _sincronizar_tree(self, tareas):
+        """Deja en el Treeview exactamente estas tareas, en este orden.
+        Solo se tocan las filas nuevas, modificadas, movidas o eliminadas."""
+        nuevas = [self._fila_tree(tarea) for tarea in tareas]
+        ids_nuevos = {clave[-1] for clave, _, _ in nuevas}
+        
+        quitar = [tarea_id for tarea_id in self._filas_tree if tarea_id not in ids_nuevos]
+        if quitar:
+            self.tree.delete(*[str(tarea_id) for tarea_id in quitar])
+            for tarea_id in quitar:
+                del self._filas_tree[tarea_id]
+        
+        # Las filas que ya están en orden relativo correcto (subsecuencia creciente más larga) no se mueven
+        posicion_actual = {iid: i for i, iid in enumerate(self.tree.get_children())}
+        existentes = [str(clave[-1]) for clave, _, _ in nuevas if str(clave[-1]) in posicion_actual]
+        estables = subsecuencia_creciente(existentes, posicion_actual)
+        
+        anterior = None
+        for clave, valores, tag in nuevas:
+            tarea_id = clave[-1]
+            iid = str(tarea_id)
+            fila = self._filas_tree.get(tarea_id)
+            if fila is None or iid not in estables:
+                # Se ubica justo después de la fila anterior del orden deseado
+                indice = self.tree.index(anterior) + 1 if anterior is not None else 0
+                if fila is None:
+                    self.tree.insert("", indice, iid=iid, values=valores, tags=(tag,))
+                else:
+                    # El índice de move() no cuenta a la propia fila
+                    if anterior is not None and self.tree.index(iid) < indice:
+                        indice -= 1
+                    self.tree.move(iid, "", indice)
+            if fila is not None and (fila[1], fila[2]) != (valores, tag):
+                self.tree.item(iid, values=valores, tags=(tag,))
+            self._filas_tree[tarea_id] = (clave, valores, tag)
+            anterior = iid
+        self._orden_tree = [clave for clave, _, _ in nuevas]
+    
+    def _actualizar_fila(self, tarea_id):
+        """Inserta, actualiza o reubica solo la fila de una tarea."""
+        if self._busqueda_activa:
+            self.actualizar_lista_tareas()
+            return
+        if self._modo_virtual:
+            self._recargar_lista_virtual()
+            return
+        tarea = self.almacen.obtener(tarea_id)
+        if tarea is None:
+            self._quitar_fila(tarea_id)
+            return
+        clave, valores, tag = self._fila_tree(tarea)
+        iid = str(tarea_id)
+        fila = self._filas_tree.get(tarea_id)
+        if fila is not None:
+            del self._orden_tree[bisect.bisect_left(self._orden_tree, fila[0])]
+        indice = bisect.bisect_left(self._orden_tree, clave)
+        self._orden_tree.insert(indice, clave)
+        if fila is None:
+            self.tree.insert("", indice, iid=iid, values=valores, tags=(tag,))
+        else:
+            if (fila[1], fila[2]) != (valores, tag):
+                self.tree.item(iid, values=valores, tags=(tag,))
+            if fila[0] != clave:
+                self.tree.move(iid, "", indice)
+        self._filas_tree[tarea_id] = (clave, valores, tag)
+    
+    def _al_cambiar_tareas(self, tarea_ids, solo_recordatorio):
+        """Suscriptor del almacén: lleva a la lista las tareas que cambiaron."""
+        if solo_recordatorio:
+            return  # La lista no muestra la próxima notificación
+        if threading.current_thread() is threading.main_thread():
+            self._refrescar_filas(tarea_ids)
+        else:
+            self.cola_ui.enviar(self._refrescar_filas, list(tarea_ids))
+    
+    def _refrescar_filas(self, tarea_ids):
+        quitadas = [tarea_id for tarea_id in tarea_ids if self.almacen.obtener(tarea_id) is None]
+        if quitadas:
+            self._quitar_filas(quitadas)
+        cambiadas = [tarea_id for tarea_id in tarea_ids if self.almacen.obtener(tarea_id) is not None]
+        if len(cambiadas) == 1:
+            self._actualizar_fila(cambiadas[0])
+        elif cambiadas:
+            # Un solo diff; solo se tocan las filas que cambiaron
+            self.actualizar_lista_tareas()
+    
+    def _quitar_fila(self, tarea_id):
+        """Quita del Treeview la fila de una tarea (si está)."""
+        self._quitar_filas([tarea_id])
+    
+    def _quitar_filas(self, tarea_ids):
+        """Quita del Treeview las filas de varias tareas con una sola llamada al widget."""
+        if self._modo_virtual:
+            self._recargar_lista_virtual()
+            return
+        iids = []
+        for tarea_id in tarea_ids:
+            fila = self._filas_tree.pop(tarea_id, None)
+            if fila is None:
+                continue
+            if self._busqueda_activa:
+                # Los resultados van por relevancia, no por clave: no se puede usar bisect
+                self._orden_tree.remove(fila[0])
+            else:
+                del self._orden_tree[bisect.bisect_left(self._orden_tree, fila[0])]
+            iids.append(str(tarea_id))
+        if iids:
+            self.tree.delete(*iids)
+    
+    # --- Modo virtual (listas muy grandes) ---
+    
+    def _filas_visibles_virtual(self):
+        """Cuántas filas caben en el alto actual del Treeview."""
+        try:
+            alto_fila = int(ttk.Style().lookup("Treeview", "rowheight") or 20)
+        except (tk.TclError, ValueError):
+            alto_fila = 20
+        alto = self.tree.winfo_height() - 25  # menos el encabezado
+        return max(int(self.tree.cget("height")), alto // alto_fila)
+    
+    def _mostrar_ventana_virtual(self):
+        """Materializa en el Treeview solo las filas visibles desde _virtual_inicio."""
+        visibles = self._filas_visibles_virtual()
+        total = self._virtual_total
+        self._virtual_inicio = max(0, min(self._virtual_inicio, total - visibles))
+        filas = self.almacen.pagina(self._virtual_inicio, visibles)
+        self._sincronizar_tree(filas)
+        if total:
+            self.scrollbar_tree.set(self._virtual_inicio / total, min(1.0, (self._virtual_inicio + len(filas)) / total))
+        else:
+            self.scrollbar_tree.set(0.0, 1.0)
+    
+    def _recargar_lista_virtual(self):
+        """Vuelve a mostrar la ventana actual (tras agregar, editar o quitar tareas)."""
+        self._virtual_total = len(self.almacen)
+        self._mostrar_ventana_virtual()
+    
+    def _desplazar_lista(self, *args):
+        """Comando de la barra de desplazamiento."""
+        if not self._modo_virtual:
+            self.tree.yview(*args)
+            return
+        if args[0] == "moveto":
+            self._virtual_inicio = int(float(args[1]) * self._virtual_total)
+        elif args[0] == "scroll":
+            paso = self._filas_visibles_virtual() if args[2] == "pages" else 1
+            self._virtual_inicio += int(args[1]) * paso
+        self._mostrar_ventana_virtual()
+    
+    def _al_desplazar_tree(self, primero, ultimo):
+        """yscrollcommand del Treeview; en modo virtual la barra la maneja _mostrar_ventana_virtual."""
+        if not self._modo_virtual:
+            self.scrollbar_tree.set(primero, ultimo)
+    
+    def _rueda_lista(self, event):
+        """Rueda del mouse sobre la lista (en modo virtual desplaza la ventana de filas)."""
+        if not self._modo_virtual:
+            return None
+        arriba = event.num == 4 or getattr(event, "delta", 0) > 0
+        self._virtual_inicio += -3 if arriba else 3
+        self._mostrar_ventana_virtual()
+        return "break"
+    
+    def _al_redimensionar_tree(self, alto=None):
+        """Al cambiar el alto de la lista, en modo virtual caben más o menos filas."""
+        if self._modo_virtual:
+            self._mostrar_ventana_virtual()
+    
+    def _ids_seleccionados(self):
+        """Ids de las tareas seleccionadas en la lista (admite selección múltiple)."""
+        return [int(iid) for iid in self.tree.selection()]
+    
     def marcar_completada(self):
-        """Marca la tarea seleccionada como completada"""
-        seleccion = self.tree.selection()
-        if not seleccion:
+        """Marca las tareas seleccionadas como completadas"""
+        tarea_ids = self._ids_seleccionados()
+        if not tarea_ids:
             messagebox.showwarning("Advertencia", "Por favor selecciona una tarea")
             return
         
-        item = self.tree.item(seleccion[0])
-        tarea_id = item['values'][0]
-        
-        self.db.marcar_completada(tarea_id)
-        messagebox.showinfo("Éxito", "Tarea marcada como completada")
-        self.actualizar_lista_tareas()
+        self.almacen.completar(tarea_ids)
+        if len(tarea_ids) == 1:
+            messagebox.showinfo("Éxito", "Tarea marcada como completada")
+        else:
+            messagebox.showinfo("Éxito", f"{len(tarea_ids)} tareas marcadas como completadas")
     
     def eliminar_tarea(self):
-        """Elimina la tarea seleccionada"""
-        seleccion = self.tree.selection()
-        if not seleccion:
+        """Elimina las tareas seleccionadas"""
+        tarea_ids = self._ids_seleccionados()
+        if not tarea_ids:
             messagebox.showwarning("Advertencia", "Por favor selecciona una tarea")
             return
         
-        respuesta = messagebox.askyesno("Confirmar", "¿Estás seguro de eliminar esta tarea?")
+        if len(tarea_ids) == 1:
+            pregunta = "¿Estás seguro de eliminar esta tarea?"
+        else:
+            pregunta = f"¿Estás seguro de eliminar estas {len(tarea_ids)} tareas?"
+        respuesta = messagebox.askyesno("Confirmar", pregunta)
         if respuesta:
-            item = self.tree.item(seleccion[0])
-            tarea_id = item['values'][0]
-            
-            self.db.eliminar_tarea(tarea_id)
-            messagebox.showinfo("Éxito", "Tarea eliminada")
-            self.actualizar_lista_tareas()
+            self.almacen.eliminar(tarea_ids)
+            messagebox.showinfo("Éxito", "Tarea eliminada" if len(tarea_ids) == 1 else f"{len(tarea_ids)} tareas eliminadas")
+    
+    def cambiar_importancia_seleccion(self, importancia):
+        """Cambia la importancia de todas las tareas seleccionadas"""
+        tarea_ids = self._ids_seleccionados()
+        if not tarea_ids:
+            messagebox.showwarning("Advertencia", "Por favor selecciona una tarea")
+            return
+        self.almacen.cambiar_importancia(tarea_ids, importancia)
+    
+    def _mostrar_menu_lista(self, event):
+        """Menú contextual (clic derecho) de la lista de tareas."""
+        iid = self.tree.identify_row(event.y)
+        if iid and iid not in self.tree.selection():
+            self.tree.selection_set(iid)
+        if not self.tree.selection():
+            return
+        try:
+            self.menu_lista.tk_popup(event.x_root, event.y_root)
+        finally:
+            self.menu_lista.grab_release()
     
     def editar_tarea(self):
-        """Abre una ventana para editar la tarea seleccionada"""
+        """Abre la ventana de edición con la tarea seleccionada"""
         seleccion = self.tree.selection()
         if not seleccion:
             messagebox.showwarning("Advertencia", "Por favor selecciona una tarea para editar")
             return
         
-        item = self.tree.item(seleccion[0])
-        tarea_id = item['values'][0]
-        
-        # Obtener los datos completos de la tarea desde la base de datos
-        tarea = self.db.obtener_tarea_por_id(tarea_id)
+        tarea = self.almacen.obtener(int(seleccion[0]))
         if not tarea:
             messagebox.showerror("Error", "No se pudo encontrar la tarea")
             return
         
-        # Desempaquetar los datos de la tarea (con o sin es_permanente)
-        if len(tarea) == 10:
-            _, titulo_actual, descripcion_actual, _, fecha_recordatorio_actual, _, notif_sistema_actual, notif_correo_actual, importancia_actual, es_permanente_actual = tarea
-        else:
-            _, titulo_actual, descripcion_actual, _, fecha_recordatorio_actual, _, notif_sistema_actual, notif_correo_actual, importancia_actual = tarea
-            es_permanente_actual = False
-        
-        t = self.get_tema()
-        # Crear ventana de edición (con colores del tema actual)
-        ventana_editar = tk.Toplevel(self.root)
-        ventana_editar.title("✏️ Editar Tarea")
-        ventana_editar.geometry("600x650")
-        ventana_editar.minsize(550, 600)
-        ventana_editar.configure(bg=t["bg_main"])
-        ventana_editar.transient(self.root)
-        ventana_editar.grab_set()
-        
-        frame_editar = tk.Frame(ventana_editar, bg=t["bg_main"], padx=20, pady=15)
-        frame_editar.pack(fill=tk.BOTH, expand=True)
-        
-        # Título
-        tk.Label(
-            frame_editar,
-            text="✏️ Editar Tarea",
-            font=("Arial", 18, "bold"),
-            bg=t["bg_main"],
-            fg=t["fg_title"]
-        ).pack(pady=(0, 15))
-        
-        # Título de la tarea
-        tk.Label(frame_editar, text="Título:", bg=t["bg_main"], fg=t["fg_text"], font=("Arial", 11, "bold")).pack(anchor=tk.W, pady=(0, 5))
-        entry_titulo_edit = tk.Entry(frame_editar, font=("Arial", 11), width=50)
-        entry_titulo_edit.pack(fill=tk.X, pady=(0, 12))
-        entry_titulo_edit.insert(0, titulo_actual)
-        
-        # Descripción
-        tk.Label(frame_editar, text="Descripción:", bg=t["bg_main"], fg=t["fg_text"], font=("Arial", 11, "bold")).pack(anchor=tk.W, pady=(0, 5))
-        text_descripcion_edit = tk.Text(frame_editar, font=("Arial", 10), height=4, width=50)
-        text_descripcion_edit.pack(fill=tk.X, pady=(0, 12))
-        text_descripcion_edit.insert("1.0", descripcion_actual or "")
-        
-        # Frame para recordatorio
-        frame_recordatorio_edit = tk.Frame(frame_editar, bg=t["bg_main"])
-        frame_recordatorio_edit.pack(fill=tk.X, pady=(0, 12))
-        
-        tk.Label(frame_recordatorio_edit, text="Fecha de recordatorio:", bg=t["bg_main"], fg=t["fg_text"], font=("Arial", 10)).pack(side=tk.LEFT, padx=(0, 10))
-        
-        calendario_edit = DateEntry(
-            frame_recordatorio_edit,
-            width=12,
-            background=t["calendar_bg"],
-            foreground=t["calendar_fg"],
-            borderwidth=2,
-            date_pattern='yyyy-mm-dd',
-            font=("Arial", 10)
-        )
-        calendario_edit.pack(side=tk.LEFT, padx=(0, 10))
-        
-        tk.Label(frame_recordatorio_edit, text="Hora (HH:MM):", bg=t["bg_main"], fg=t["fg_text"], font=("Arial", 10)).pack(side=tk.LEFT, padx=(0, 5))
-        entry_hora_edit = tk.Entry(frame_recordatorio_edit, font=("Arial", 10), width=8)
-        entry_hora_edit.pack(side=tk.LEFT)
-        
-        var_usar_recordatorio_edit = tk.BooleanVar(value=(fecha_recordatorio_actual is not None))
-        if fecha_recordatorio_actual:
+        dialogo = self._preparar_dialogo_editar()
+        if dialogo is None:
+            messagebox.showerror("Error", "No se pudo abrir la ventana de edición")
+            return
+        dialogo.abrir(tarea)
+    
+    def _preparar_dialogo_editar(self):
+        """Crea la ventana de edición (oculta) si todavía no existe."""
+        if self.dialogo_editar is None:
             try:
-                fecha_dt = datetime.strptime(fecha_recordatorio_actual, "%Y-%m-%d %H:%M")
-                calendario_edit.set_date(fecha_dt.date())
-                entry_hora_edit.insert(0, fecha_dt.strftime("%H:%M"))
-            except:
-                pass
-        
-        def toggle_recordatorio_edit():
-            estado = var_usar_recordatorio_edit.get()
-            if estado:
-                calendario_edit.config(state='normal')
-                entry_hora_edit.config(state='normal')
-            else:
-                calendario_edit.config(state='disabled')
-                entry_hora_edit.config(state='disabled')
-        
-        var_usar_recordatorio_edit.trace('w', lambda *args: toggle_recordatorio_edit())
-        
-        tk.Checkbutton(
-            frame_recordatorio_edit,
-            text="Activar recordatorio",
-            variable=var_usar_recordatorio_edit,
-            bg=t["bg_main"],
-            fg=t["fg_text"],
-            font=("Arial", 10),
-            command=toggle_recordatorio_edit
-        ).pack(side=tk.LEFT, padx=(10, 0))
-        
-        var_es_permanente_edit = tk.BooleanVar(value=bool(es_permanente_actual))
-        tk.Checkbutton(
-            frame_recordatorio_edit,
-            text="🔄 Tarea permanente (diaria desde esta fecha)",
-            variable=var_es_permanente_edit,
-            bg=t["bg_main"],
-            font=("Arial", 10),
-            fg=t["fg_text"]
-        ).pack(side=tk.LEFT, padx=(15, 0))
-        
-        toggle_recordatorio_edit()
-        
-        frame_importancia_edit = tk.Frame(frame_editar, bg=t["bg_main"])
-        frame_importancia_edit.pack(fill=tk.X, pady=(0, 12))
-        
-        tk.Label(frame_importancia_edit, text="Importancia:", bg=t["bg_main"], fg=t["fg_text"], font=("Arial", 10, "bold")).pack(side=tk.LEFT, padx=(0, 10))
-        
-        var_importancia_edit = tk.StringVar(value=importancia_actual or "Normal")
-        for opcion in ["Normal", "Importante", "Urgente"]:
-            color = t["importance_normal"] if opcion == "Normal" else t["importance_importante"] if opcion == "Importante" else t["importance_urgente"]
-            tk.Radiobutton(
-                frame_importancia_edit,
-                text=opcion,
-                variable=var_importancia_edit,
-                value=opcion,
-                bg=t["bg_main"],
-                fg=t["fg_text"],
-                font=("Arial", 10),
-                selectcolor=color,
-                activebackground=t["bg_main"]
-            ).pack(side=tk.LEFT, padx=(0, 15))
-        
-        frame_notificaciones_edit = tk.Frame(frame_editar, bg=t["bg_main"])
-        frame_notificaciones_edit.pack(fill=tk.X, pady=(0, 15))
-        
-        var_notif_sistema_edit = tk.BooleanVar(value=bool(notif_sistema_actual))
-        tk.Label(
-            frame_notificaciones_edit,
-            text="✨ Las notificaciones se enviarán automáticamente ✨",
-            bg=t["bg_main"],
-            font=("Arial", 10, "bold"),
-            fg=t["fg_title"]
-        ).pack(side=tk.LEFT)
-        
-        def guardar_cambios():
-            """Guarda los cambios realizados en la tarea"""
-            nuevo_titulo = entry_titulo_edit.get().strip()
-            if not nuevo_titulo:
-                messagebox.showwarning("Advertencia", "El título no puede estar vacío")
-                return
-            
-            nueva_descripcion = text_descripcion_edit.get("1.0", tk.END).strip()
-            
-            # Obtener fecha y hora del recordatorio
-            nueva_fecha_recordatorio = None
-            if var_usar_recordatorio_edit.get():
-                fecha_seleccionada = calendario_edit.get_date()
-                hora_str = entry_hora_edit.get().strip()
-                
-                if not hora_str:
-                    messagebox.showwarning("Advertencia", "Por favor ingresa una hora para el recordatorio")
-                    return
-                
-                try:
-                    # Validar formato de hora
-                    hora_parts = hora_str.split(":")
-                    if len(hora_parts) != 2:
-                        raise ValueError
-                    hora = int(hora_parts[0])
-                    minuto = int(hora_parts[1])
-                    if not (0 <= hora <= 23 and 0 <= minuto <= 59):
-                        raise ValueError
-                    
-                    # Combinar fecha y hora
-                    # Para tareas permanentes, la fecha es la fecha de inicio (desde cuándo empezar a notificar diariamente)
-                    # Para tareas normales, es la fecha específica del recordatorio
-                    nueva_fecha_recordatorio = fecha_seleccionada.strftime("%Y-%m-%d") + f" {hora:02d}:{minuto:02d}:00"
-                except ValueError:
-                    messagebox.showerror("Error", "Formato de hora incorrecto. Usa: HH:MM (ejemplo: 14:30)")
-                    return
-            
-            # Validar que si es permanente, tenga recordatorio
-            es_permanente_nuevo = var_es_permanente_edit.get()
-            if es_permanente_nuevo and not nueva_fecha_recordatorio:
-                messagebox.showwarning("Advertencia", "Las tareas permanentes requieren un recordatorio con hora.")
-                return
-            
-            # Actualizar la tarea en la base de datos
-            self.db.actualizar_tarea(
-                tarea_id,
-                titulo=nuevo_titulo,
-                descripcion=nueva_descripcion,
-                fecha_recordatorio=nueva_fecha_recordatorio,
-                notif_sistema=var_notif_sistema_edit.get(),
-                notif_correo=False,  # Siempre False ahora
-                importancia=var_importancia_edit.get(),
-                es_permanente=es_permanente_nuevo
-            )
-            
-            messagebox.showinfo("Éxito", "Tarea actualizada correctamente")
-            ventana_editar.destroy()
-            self.actualizar_lista_tareas()
-        
-        frame_botones_edit = tk.Frame(frame_editar, bg=t["bg_main"])
-        frame_botones_edit.pack(fill=tk.X, pady=(15, 0))
-        
-        tk.Button(
-            frame_botones_edit,
-            text="💾 Guardar Cambios",
-            command=guardar_cambios,
-            bg=t["btn_bg"],
-            fg=t["btn_fg"],
-            font=("Arial", 11, "bold"),
-            padx=20,
-            pady=5,
-            cursor="hand2"
-        ).pack(side=tk.LEFT, padx=5)
-        
-        tk.Button(
-            frame_botones_edit,
-            text="❌ Cancelar",
-            command=ventana_editar.destroy,
-            bg=t["importance_urgente"],
-            fg="white",
-            font=("Arial", 11, "bold"),
-            padx=20,
-            pady=5,
-            cursor="hand2"
-        ).pack(side=tk.LEFT, padx=5)
+                self.dialogo_editar = DialogoEditarTarea(self)
+            except Exception as e:
+                print(f"Error al crear la ventana de edición: {e}")
+        return self.dialogo_editar
     
     def verificar_recordatorios(self):
-        """Verifica y envía recordatorios de tareas pendientes"""
-        tareas = self.db.obtener_tareas_pendientes_recordatorio()
+        """Verifica y envía recordatorios de tareas pendientes (cada uno una sola vez)"""
+        tareas = self.almacen.vencidas()
+        avisos = []
         
         for tarea in tareas:
-            # Manejar formato con es_permanente (ahora son 8 campos)
-            if len(tarea) == 8:
-                tarea_id, titulo, descripcion, fecha_recordatorio, notif_sistema, notif_correo, importancia, es_permanente = tarea
-            elif len(tarea) == 7:
-                tarea_id, titulo, descripcion, fecha_recordatorio, notif_sistema, notif_correo, importancia = tarea
-                es_permanente = False
-            else:
-                tarea_id, titulo, descripcion, fecha_recordatorio, notif_sistema, notif_correo = tarea
-                importancia = "Normal"
-                es_permanente = False
+            mensaje = tarea.descripcion or ""
+            if tarea.importancia:
+                mensaje += f"\nImportancia: {tarea.importancia}" if mensaje else f"Importancia: {tarea.importancia}"
             
-            mensaje = descripcion or ""
-            if importancia:
-                mensaje += f"\nImportancia: {importancia}" if mensaje else f"Importancia: {importancia}"
-            
-            if notif_sistema:
-                self.notificador.notificar_sistema(titulo, mensaje)
-            
-            # Marcar como completada después de enviar notificación (opcional)
-            # self.db.marcar_completada(tarea_id)
+            if tarea.notif_sistema:
+                avisos.append((tarea.titulo, mensaje, lambda tarea_id=tarea.id: self.almacen.posponer(tarea_id)))
+        
+        if avisos:
+            # Corre en el hilo del planificador: el notificador pasa al hilo de Tk solo si lo necesita.
+            # Los que vencen juntos se muestran en una sola notificación de resumen.
+            self.notificador.notificar_varios(avisos)
+        
+        # Registrar la entrega para que cada recordatorio se notifique una sola vez
+        self.almacen.registrar_notificacion([tarea.id for tarea in tareas])
     
     def configurar_bandeja_sistema(self):
         """Configura el icono en la bandeja del sistema"""
-        if not HAS_PYSTRAY:
-            return
-        
         ruta_icono = get_ruta_recurso("icono_unicornio.png")
         if not os.path.isfile(ruta_icono):
             return
         
+        pystray = importar_diferido("pystray")
+        Image = importar_diferido("PIL.Image")
+        if pystray is None or Image is None:
+            return
+        
         try:
             # Cargar imagen para la bandeja (16x16 o 32x32)
             img_tray = Image.open(ruta_icono)
@@ -1561,8 +3272,8 @@ class TodoApp:
             
             # Crear menú contextual
             menu = (
-                item("Abrir Agenda Virtual", self.mostrar_ventana),
-                item("Cerrar", self.cerrar_aplicacion),
+                pystray.MenuItem("Abrir Agenda Virtual", self._mostrar_desde_bandeja),
+                pystray.MenuItem("Cerrar", self._cerrar_desde_bandeja),
             )
             
             # Crear icono en la bandeja
@@ -1577,16 +3288,35 @@ class TodoApp:
         except Exception as e:
             print(f"Error al configurar bandeja del sistema: {e}")
     
+    def _mostrar_desde_bandeja(self, icon=None, item=None):
+        """Acción del menú de la bandeja (corre en el hilo de pystray)."""
+        self.cola_ui.enviar(self.mostrar_ventana)
+    
+    def _cerrar_desde_bandeja(self, icon=None, item=None):
+        """Acción del menú de la bandeja (corre en el hilo de pystray)."""
+        self.cola_ui.enviar(self.cerrar_aplicacion)
+    
+    def _al_ocultar_root(self, event):
+        # <Unmap> también llega por cada hijo: solo interesa la ventana principal
+        if event.widget is self.root:
+            self.reloj_animacion.pausar()
+    
+    def _al_mostrar_root(self, event):
+        if event.widget is self.root:
+            self.reloj_animacion.reanudar()
+    
     def mostrar_ventana(self, icon=None, item=None):
         """Muestra la ventana principal desde la bandeja"""
+        self.reloj_animacion.reanudar()
         self.root.deiconify()
         self.root.lift()
         self.root.focus_force()
     
     def on_closing(self):
         """Se ejecuta cuando intentan cerrar la ventana - minimiza a la bandeja"""
-        if HAS_PYSTRAY and self.tray_icon:
+        if self.tray_icon:
             self.root.withdraw()  # Ocultar ventana sin cerrar
+            self.reloj_animacion.pausar()
         else:
             # Si no hay bandeja, cerrar normalmente
             self.cerrar_aplicacion()
@@ -1595,39 +3325,43 @@ class TodoApp:
         """Cierra completamente la aplicación"""
         if self.tray_icon:
             self.tray_icon.stop()
+        if self.planificador:
+            self.planificador.detener()
+        self.cola_ui.detener()
+        self.notificador.cerrar()
+        obtener_config().guardar_ahora()
+        self.db.cerrar()
         self.root.quit()
         self.root.destroy()
     
     def iniciar_verificador_recordatorios(self):
-        """Inicia el hilo que verifica recordatorios periódicamente"""
-        def ejecutar_verificador():
-            schedule.every(1).minutes.do(self.verificar_recordatorios)
-            while True:
-                schedule.run_pending()
-                time.sleep(60)
-        
-        thread = threading.Thread(target=ejecutar_verificador, daemon=True)
-        thread.start()
-
+        """Inicia el planificador que despierta justo cuando vence el próximo recordatorio"""
+        self.planificador = PlanificadorRecordatorios(self.almacen, self.verificar_recordatorios)
+        self.almacen.suscribir(self.planificador.marcar_cambios)
+        self.planificador.iniciar()
 
 def main():
     """Función principal"""
     root = tk.Tk()
+    TIEMPOS_INICIO["tk"] = ms_desde_inicio()
     # Icono de unicornio (funciona en desarrollo y en .exe empaquetado)
     ruta_icono = get_ruta_recurso("icono_unicornio.png")
-    if HAS_PIL and os.path.isfile(ruta_icono):
+    if os.path.isfile(ruta_icono):
         try:
-            img = Image.open(ruta_icono)
-            icono = ImageTk.PhotoImage(img)
+            # Tk 8.6 lee PNG directamente: no hace falta cargar PIL para el icono
+            icono = tk.PhotoImage(file=ruta_icono)
             root.iconphoto(True, icono)
             root._icono_unicornio = icono  # mantener referencia
         except Exception:
             pass
-    # Base de datos junto al ejecutable (o al script) para que persista al instalar
-    ruta_db = os.path.join(get_ruta_base(), "tareas.db")
+    # Base de datos junto al ejecutable (o al script) para que persista al instalar.
+    # AGENDA_RUTA_DB permite usar otra (benchmarks, pruebas)
+    ruta_db = os.environ.get("AGENDA_RUTA_DB") or os.path.join(get_ruta_base(), "tareas.db")
     app = TodoApp(root, db_path=ruta_db)
     root.mainloop()
 
 
+TIEMPOS_INICIO["imports"] = ms_desde_inicio()
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,145 @@
+"""Pruebas de la entrega de recordatorios (cada notificación una sola vez)."""
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import main
+
+
+@pytest.fixture
+def almacen(tmp_path):
+    db = main.Database(str(tmp_path / "tareas.db"))
+    almacen = main.AlmacenTareas(db)
+    almacen.cargar()
+    yield almacen
+    db.cerrar()
+
+
+def test_editar_titulo_no_vuelve_a_notificar(almacen):
+    tarea_id = almacen.agregar("Pagar la luz", "", "2000-01-01 10:00:00")
+    assert [t.id for t in almacen.vencidas()] == [tarea_id]
+    almacen.registrar_notificacion([tarea_id])
+
+    # El diálogo de edición siempre manda la fecha y es_permanente, aunque no cambien
+    almacen.actualizar(tarea_id, titulo="Pagar la luz y el agua", descripcion="",
+                       fecha_recordatorio="2000-01-01 10:00:00", es_permanente=False)
+
+    assert almacen.vencidas() == []
+    assert almacen.db.obtener_tareas_pendientes_recordatorio() == []
+
+
+def test_editar_tarea_permanente_no_repite_el_aviso_de_hoy(almacen):
+    fecha = main.ahora_local().strftime("%Y-%m-%d %H:%M:00")
+    tarea_id = almacen.agregar("Regar las plantas", "", fecha, es_permanente=True)
+    almacen.registrar_notificacion([tarea_id])
+
+    almacen.actualizar(tarea_id, titulo="Regar las plantas 🌱", fecha_recordatorio=fecha, es_permanente=True)
+
+    assert almacen.vencidas() == []
+
+
+def test_cambiar_la_fecha_vuelve_a_programar(almacen):
+    tarea_id = almacen.agregar("Llamar a mamá", "", "2000-01-01 10:00:00")
+    almacen.registrar_notificacion([tarea_id])
+
+    almacen.actualizar(tarea_id, fecha_recordatorio="2000-01-02 10:00:00")
+
+    assert [t.id for t in almacen.vencidas()] == [tarea_id]
+
+
+def _plan_de(db, llamada):
+    """Plan (EXPLAIN QUERY PLAN) de la consulta que ejecuta llamada()."""
+    consultas = []
+    conn = db._conexion()
+    conn.set_trace_callback(consultas.append)
+    try:
+        llamada()
+    finally:
+        conn.set_trace_callback(None)
+    consulta = next(c for c in consultas if c.lstrip().startswith("SELECT"))
+    return " | ".join(fila[3] for fila in conn.execute("EXPLAIN QUERY PLAN " + consulta))
+
+
+def test_recordatorios_vencidos_usan_el_indice_parcial(almacen):
+    db = almacen.db
+    db.agregar_tareas([
+        {"titulo": f"Tarea {i}", "fecha_recordatorio": "2000-01-01 10:00:00" if i % 50 == 0 else None}
+        for i in range(2000)
+    ])
+
+    plan = _plan_de(db, db.obtener_tareas_pendientes_recordatorio)
+    assert "idx_tareas_proxima_notificacion_utc" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+def test_recargar_programa_tareas_escritas_por_fuera(almacen):
+    vencidas = []
+    entregado = threading.Event()
+
+    def al_vencer():
+        ids = [t.id for t in almacen.vencidas()]
+        vencidas.extend(ids)
+        almacen.registrar_notificacion(ids)
+        entregado.set()
+
+    planificador = main.PlanificadorRecordatorios(almacen, al_vencer)
+    almacen.suscribir(planificador.marcar_cambios)
+    planificador.iniciar()
+    try:
+        # Escritura directa en la base, como la de un script
+        tarea_id = almacen.db.agregar_tarea("Desde un script", "", "2000-01-01 10:00:00")
+        almacen.cargar()
+        planificador.recargar()
+        assert entregado.wait(5)
+    finally:
+        planificador.detener()
+
+    assert vencidas == [tarea_id]
+
+
+def test_registrar_no_pisa_un_recordatorio_pospuesto(almacen):
+    tarea_id = almacen.agregar("Sacar la basura", "", "2000-01-01 10:00:00")
+    vencidas = [t.id for t in almacen.vencidas()]
+    # El usuario pospone mientras la notificación se está mostrando
+    almacen.posponer(tarea_id)
+    almacen.registrar_notificacion(vencidas)
+
+    assert almacen.proxima_notificacion(tarea_id) is not None
+
+
+def test_registrar_muchas_tareas_de_una_vez(almacen):
+    ids = almacen.db.agregar_tareas(
+        [{"titulo": f"Tarea {i}", "fecha_recordatorio": "2000-01-01 10:00:00"} for i in range(1200)]
+    )
+    almacen.cargar()
+    almacen.registrar_notificacion(ids)
+
+    assert almacen.vencidas() == []
+
+
+def test_planificador_reintenta_si_falla_la_entrega(almacen, monkeypatch):
+    monkeypatch.setattr(main.PlanificadorRecordatorios, "ESPERA_REINTENTO", 0)
+    intentos = []
+    entregado = threading.Event()
+
+    def al_vencer():
+        intentos.append(1)
+        if len(intentos) == 1:
+            raise main.sqlite3.OperationalError("database is locked")
+        almacen.registrar_notificacion([t.id for t in almacen.vencidas()])
+        entregado.set()
+
+    almacen.agregar("Tomar el remedio", "", "2000-01-01 10:00:00")
+    planificador = main.PlanificadorRecordatorios(almacen, al_vencer)
+    almacen.suscribir(planificador.marcar_cambios)
+    planificador.iniciar()
+    try:
+        assert entregado.wait(5)
+    finally:
+        planificador.detener()
+
+    assert len(intentos) == 2
+    assert almacen.vencidas() == []